@@ -1,10 +1,11 @@
 import sys
 import json
-import pandas as pd
+import numpy as np
 import plotly.express as px
 
 from src.catching import attempt_catch
 from src.pokemon import PokemonFactory, StatusEffect
+from src.results import grid_frame
 
 def run_analysis(config_path="config.json"):
     # 1. Load the config
@@ -16,14 +17,13 @@ def run_analysis(config_path="config.json"):
     num_experiments = config["num_experiments"]
     noise = config["noise"]
 
-    # 2. Prepare factory and data collector
+    # 2. Prepare factory and result arrays
     factory = PokemonFactory("pokemon.json")
-    results = []
+    success_rates = np.zeros((len(pokemon_list), len(pokeballs)), dtype=np.float32)
 
     # 3. Run simulations for ideal conditions
-    for pkmn_name in pokemon_list:
-        base_success_rate = None  # To store the success rate of the basic Pokéball
-        for ball in pokeballs:
+    for i, pkmn_name in enumerate(pokemon_list):
+        for j, ball in enumerate(pokeballs):
             success_count = 0
             # Attempt capture multiple times to estimate success rate
             for _ in range(num_experiments):
@@ -38,30 +38,21 @@ def run_analysis(config_path="config.json"):
                 if attempt_success:
                     success_count += 1
 
-            success_rate = success_count / num_experiments
+            success_rates[i, j] = success_count / num_experiments
 
-            # Store the success rate of the basic Pokéball
-            if ball == "pokeball":
-                base_success_rate = success_rate
-
-            # Store the results
-            results.append({
-                "pokemon": pkmn_name,
-                "pokeball": ball,
-                "success_rate": success_rate,
-                "relative_effectiveness": None  # Placeholder for now
-            })
-
-        # Calculate relative effectiveness for all Pokéballs for this Pokémon
-        for result in results:
-            if result["pokemon"] == pkmn_name:
-                result["relative_effectiveness"] = (
-                    result["success_rate"] / base_success_rate
-                    if base_success_rate > 0 else None
-                )
+    # Relative effectiveness against the basic Pokéball, NaN when it never caught
+    relative_effectiveness = np.full_like(success_rates, np.nan)
+    if "pokeball" in pokeballs:
+        base_success_rate = success_rates[:, [pokeballs.index("pokeball")]]
+        np.divide(success_rates, base_success_rate, out=relative_effectiveness,
+                  where=base_success_rate > 0)
 
     # Convert results to a DataFrame for easier manipulation
-    df = pd.DataFrame(results)
+    df = grid_frame(
+        {"pokemon": pokemon_list, "pokeball": pokeballs},
+        success_rate=success_rates,
+        relative_effectiveness=relative_effectiveness,
+    )
     print(df.head(10))  # Quick sanity check
 
     # ------------------------------------------------------------------
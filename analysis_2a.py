@@ -6,6 +6,7 @@ import sys
 
 from src.catching import attempt_catch
 from src.pokemon import PokemonFactory, StatusEffect
+from src.stats import OnlineStats, wilson_interval
 
 def analyze_status_effects(config_path="configs/config_2a.json"):
     factory = PokemonFactory("pokemon.json")
@@ -32,27 +33,30 @@ def analyze_status_effects(config_path="configs/config_2a.json"):
 
     for pokemon_name in pokemon_list:
         for status in status_effects:
-            successful_catches = []
-            capture_rates = [] #only for printing, wont be in graph
+            #running statistics, memory doesn't grow with num_trials
+            stats = OnlineStats.zeros()
 
             for _ in range(num_trials):
                 #create pokemon with 100hp and level 1
                 pokemon = factory.create(pokemon_name, 100, status, 1)
                 success, capture_rate = attempt_catch(pokemon, ball, noise)
-                successful_catches.append(success)
-                capture_rates.append(capture_rate)
+                stats = stats.add(success, capture_rate)
 
             #statistics for printing + graphing
-            avg_success_rate = sum(successful_catches) / num_trials
-            std_dev = np.std(capture_rates)
+            avg_success_rate = float(stats.success_rate)
+            std_dev = float(stats.std) #capture rate std, only for printing, wont be in graph
+            ci_low, ci_high = wilson_interval(stats.successes, stats.count)
 
             #storing stats for each pokemon & status
             results[pokemon_name][status.name] = {
                 "success_rate": avg_success_rate,
-                "std_dev": std_dev
+                "std_dev": std_dev,
+                "ci_low": float(ci_low),
+                "ci_high": float(ci_high)
             }
 
-            print(f"[{pokemon_name}] Status: {status.name}, Success Rate: {avg_success_rate:.2%}, Std Dev: {std_dev:.4f}")
+            print(f"[{pokemon_name}] Status: {status.name}, Success Rate: {avg_success_rate:.2%} "
+                  f"(95% CI {ci_low:.2%} - {ci_high:.2%}), Capture Rate Std Dev: {std_dev:.4f}")
 
     colors = ["yellow", "orange", "purple", "red", "blue", "green"]
     fig = go.Figure()
@@ -64,13 +68,19 @@ def analyze_status_effects(config_path="configs/config_2a.json"):
     for i, pokemon_name in enumerate(pokemon_list):
         status_names = list(results[pokemon_name].keys())
         success_rates = [results[pokemon_name][status]["success_rate"] for status in status_names]
-        std_devs = [results[pokemon_name][status]["std_dev"] for status in status_names]
+        ci_lows = [results[pokemon_name][status]["ci_low"] for status in status_names]
+        ci_highs = [results[pokemon_name][status]["ci_high"] for status in status_names]
 
-        #a bar for each status in the group
+        #a bar for each status in the group, error bars are the 95% wilson interval
         fig.add_trace(go.Bar(
             x=[x_positions[i] + j * bar_width for j in range(len(status_names))],  #status positions
             y=success_rates,
-            error_y=dict(type="data", array=std_devs),
+            error_y=dict(
+                type="data",
+                symmetric=False,
+                array=np.subtract(ci_highs, success_rates),
+                arrayminus=np.subtract(success_rates, ci_lows)
+            ),
             name=pokemon_name,
             marker=dict(color=colors),
             text=status_names,  #status effect labels
@@ -1,13 +1,15 @@
+import os
 import sys
 import json
 import math
 import random
 import pandas as pd
 import matplotlib.pyplot as plt
-import numpy as np
 
-from src.catching import attempt_catch
+from src.cube import ResultCube
 from src.pokemon import PokemonFactory, StatusEffect
+from src.sensitivity import FACTORS, sensitivity_report
+from src.sweep import check_labels, run_sweep, sweep_axes
 
 def run_analysis_2d(config_path="configs/config_2c.json"):
     # Load configuration
@@ -29,50 +31,37 @@ def run_analysis_2d(config_path="configs/config_2c.json"):
     fixed_level = config["fixed_level"]
 
     factory = PokemonFactory("pokemon.json")
-    results = []
-
-    # Run simulation over all combinations
-    for pkmn_name in pokemon_list:
-        for status_str in statuses:
-            status_effect = StatusEffect[status_str]
-            for hp_perc in hp_percentages:
-                for lvl in levels:
-                    for ball in pokeballs:
-                        success_count = 0
-                        for _ in range(num_experiments):
-                            poke = factory.create(pkmn_name, lvl, status_effect, hp_perc)
-                            attempt_success, _ = attempt_catch(poke, ball, noise)
-                            if attempt_success:
-                                success_count += 1
-                        success_rate = success_count / num_experiments
-                        results.append({
-                            "pokemon": pkmn_name,
-                            "status": status_str,
-                            "hp_perc": hp_perc,
-                            "level": lvl,
-                            "pokeball": ball,
-                            "success_rate": success_rate
-                        })
+    axes = sweep_axes(pokemon_list, statuses, hp_percentages, levels, pokeballs)
+    # The graphs select these values, graphs 1-3 with the normal pokéball
+    check_labels(
+        axes, status=fixed_status.name, hp_perc=fixed_hp, level=fixed_level, pokeball="pokeball"
+    )
 
-    # Convert results to a DataFrame
-    df = pd.DataFrame(results)
+    # Optional memory-mapped output, reused by later runs instead of re-simulating
+    output = config.get("output")
+    run = {"num_experiments": num_experiments, "noise": noise, "metric": "success_rate"}
+    cube = None
+    if output and os.path.exists(f"{output}.json"):
+        cube = ResultCube.open(output)
+        if cube.matches(axes, run):
+            print(f"Reading results from {output}")
+        else:
+            print(f"{output} is incomplete or from another configuration, simulating again")
+            cube = None
+    if cube is None:
+        out = ResultCube.create(output, axes, meta=run) if output else None
+        # Run simulation over all combinations
+        # Each pokemon is recorded in the output once its results are written
+        cube = run_sweep(axes, num_experiments, noise, "success_rate", out=out, factory=factory)
     
     # --- Graph 1: Combined Success vs. HP Percentage (Normal Pokéball, Fixed Level & Status) ---
     fig, ax = plt.subplots(figsize=(8, 5))
-    hp_diff_percentages = []  # store per-Pokémon percentage differences over HP
-    for pkmn in df["pokemon"].unique():
-        subset = df[(df["pokemon"] == pkmn) &
-                    (df["pokeball"] == "pokeball") &  # normal pokéball
-                    (df["level"] == fixed_level) &
-                    (df["status"] == fixed_status.name)]
-        if not subset.empty:
-            ax.plot(subset["hp_perc"], subset["success_rate"], marker='o', label=pkmn.capitalize())
-            max_success = subset["success_rate"].max()
-            min_success = subset["success_rate"].min()
-            mean_success = subset["success_rate"].mean()
-            diff_pct = ((max_success - min_success) / mean_success * 100) if mean_success != 0 else 0
-            hp_diff_percentages.append(diff_pct)
-    overall_hp_diff = np.mean(hp_diff_percentages) if hp_diff_percentages else 0
+    # (pokemon, hp_perc) view with the normal pokéball
+    hp_cube = cube.sel(pokeball="pokeball", level=fixed_level, status=fixed_status.name)
+    for pkmn, success_rates in zip(hp_cube.axes["pokemon"], hp_cube.values):
+        ax.plot(hp_cube.axes["hp_perc"], success_rates, marker='o', label=pkmn.capitalize())
+    # per-Pokémon percentage differences over HP, averaged over Pokémon
+    overall_hp_diff = hp_cube.relative_spread("hp_perc").values.mean()
     print(f"\nGraph 1 (HP Variation) - Overall Average % Difference: {overall_hp_diff:.2f}%")
     ax.set_title(f"Combined: Success vs. HP Percentage\n(Fixed Level: {fixed_level}, Status: {fixed_status.name}, Normal Pokéball)\nAvg % Difference: {overall_hp_diff:.2f}%")
     ax.set_xlabel("HP Percentage")
@@ -83,20 +72,12 @@ def run_analysis_2d(config_path="configs/config_2c.json"):
     
     # --- Graph 2: Combined Success vs. Level (Normal Pokéball, Fixed HP & Status) ---
     fig, ax = plt.subplots(figsize=(8, 5))
-    level_diff_percentages = []  # store per-Pokémon percentage differences over Level
-    for pkmn in df["pokemon"].unique():
-        subset = df[(df["pokemon"] == pkmn) &
-                    (df["pokeball"] == "pokeball") &
-                    (df["hp_perc"] == fixed_hp) &
-                    (df["status"] == fixed_status.name)]
-        if not subset.empty:
-            ax.plot(subset["level"], subset["success_rate"], marker='o', label=pkmn.capitalize())
-            max_success = subset["success_rate"].max()
-            min_success = subset["success_rate"].min()
-            mean_success = subset["success_rate"].mean()
-            diff_pct = ((max_success - min_success) / mean_success * 100) if mean_success != 0 else 0
-            level_diff_percentages.append(diff_pct)
-    overall_level_diff = np.mean(level_diff_percentages) if level_diff_percentages else 0
+    # (pokemon, level) view with the normal pokéball
+    level_cube = cube.sel(pokeball="pokeball", hp_perc=fixed_hp, status=fixed_status.name)
+    for pkmn, success_rates in zip(level_cube.axes["pokemon"], level_cube.values):
+        ax.plot(level_cube.axes["level"], success_rates, marker='o', label=pkmn.capitalize())
+    # per-Pokémon percentage differences over Level, averaged over Pokémon
+    overall_level_diff = level_cube.relative_spread("level").values.mean()
     print(f"\nGraph 2 (Level Variation) - Overall Average % Difference: {overall_level_diff:.2f}%")
     ax.set_title(f"Combined: Success vs. Level\n(Fixed HP: {fixed_hp*100:.0f}%, Status: {fixed_status.name}, Normal Pokéball)\nAvg % Difference: {overall_level_diff:.2f}%")
     ax.set_xlabel("Level")
@@ -106,18 +87,9 @@ def run_analysis_2d(config_path="configs/config_2c.json"):
     plt.show()
     
     # --- Graph 3: Combined Status Variation (Normal Pokéball, Fixed HP & Level, All Pokémon) ---
-    mask_status = (df["hp_perc"] == fixed_hp) & (df["level"] == fixed_level) & (df["pokeball"] == "pokeball")
-    df_status_fixed = df[mask_status]
-    pivot_status = df_status_fixed.pivot_table(index="pokemon", columns="status", values="success_rate", aggfunc="mean")
-    pivot_status = pivot_status.sort_index()
-    status_diff_percentages = {}
-    for pkmn, row in pivot_status.iterrows():
-        max_val = row.max()
-        min_val = row.min()
-        mean_val = row.mean()
-        diff_pct = ((max_val - min_val) / mean_val * 100) if mean_val != 0 else 0
-        status_diff_percentages[pkmn] = diff_pct
-    overall_status_diff = np.mean(list(status_diff_percentages.values()))
+    status_cube = cube.sel(hp_perc=fixed_hp, level=fixed_level, pokeball="pokeball")
+    pivot_status = status_cube.to_table().sort_index().sort_index(axis=1)
+    overall_status_diff = status_cube.relative_spread("status").values.mean()
     print(f"\nGraph 3 (Status Variation) - Overall Average % Difference: {overall_status_diff:.2f}%")
     fig, ax = plt.subplots(figsize=(10, 6))
     pivot_status.plot(kind="bar", ax=ax)
@@ -128,19 +100,9 @@ def run_analysis_2d(config_path="configs/config_2c.json"):
     plt.show()
     
     # --- Graph 4: Combined Graph for Fixed HP, Level, and Status (Pokéball Variation) ---
-    mask_fixed = (df["hp_perc"] == fixed_hp) & (df["level"] == fixed_level) & (df["status"] == fixed_status.name)
-    df_fixed = df[mask_fixed]
-    summary_fixed = df_fixed.groupby(["pokemon", "pokeball"])["success_rate"].mean().reset_index()
-    pivot_fixed = summary_fixed.pivot(index="pokemon", columns="pokeball", values="success_rate")
-    pivot_fixed = pivot_fixed.sort_index()
-    pokeball_diff_percentages = {}
-    for pkmn, row in pivot_fixed.iterrows():
-        max_val = row.max()
-        min_val = row.min()
-        mean_val = row.mean()
-        diff_pct = ((max_val - min_val) / mean_val * 100) if mean_val != 0 else 0
-        pokeball_diff_percentages[pkmn] = diff_pct
-    overall_pokeball_diff = np.mean(list(pokeball_diff_percentages.values()))
+    pokeball_cube = cube.sel(hp_perc=fixed_hp, level=fixed_level, status=fixed_status.name)
+    pivot_fixed = pokeball_cube.to_table().sort_index().sort_index(axis=1)
+    overall_pokeball_diff = pokeball_cube.relative_spread("pokeball").values.mean()
     print(f"\nGraph 4 (Pokéball Variation) - Overall Average % Difference between pokéballs: {overall_pokeball_diff:.2f}%")
     fig, ax = plt.subplots(figsize=(10, 6))
     pivot_fixed.plot(kind='bar', ax=ax)
@@ -155,6 +117,36 @@ def run_analysis_2d(config_path="configs/config_2c.json"):
     plt.tight_layout()
     plt.show()
 
+    # --- Analytic sensitivity: the same comparisons from the closed form, without noise ---
+    report = sensitivity_report(axes, factory)
+    probability = report.probability
+    spreads = {
+        "hp_perc": probability.sel(pokeball="pokeball", level=fixed_level, status=fixed_status.name),
+        "level": probability.sel(pokeball="pokeball", hp_perc=fixed_hp, status=fixed_status.name),
+        "status": probability.sel(hp_perc=fixed_hp, level=fixed_level, pokeball="pokeball"),
+        "pokeball": probability.sel(hp_perc=fixed_hp, level=fixed_level, status=fixed_status.name),
+    }
+    spreads = pd.DataFrame(
+        {dim: view.relative_spread(dim).values for dim, view in spreads.items()},
+        index=probability.axes["pokemon"],
+    )
+    print("\nAnalytic (noise-free) Average % Difference:")
+    for dim, spread in spreads.mean().items():
+        print(f"  {dim}: {spread:.2f}%")
+
+    # Elasticities at the fixed operating point with the normal pokéball
+    point = dict(status=fixed_status.name, hp_perc=fixed_hp, level=fixed_level, pokeball="pokeball")
+    elasticities = pd.DataFrame(
+        {f: report.elasticities[f].sel(**point).values for f in FACTORS},
+        index=report.probability.axes["pokemon"],
+    )
+    # Status and ball scale the same product catch_rate * ball * status, so their
+    # elasticities are equal: rank by the spread over the configured values instead
+    elasticities["most_important"] = spreads.idxmax(axis=1)
+    print("\nElasticities at the fixed operating point (% change in capture probability per 1% change),")
+    print("most important factor by analytic % difference over the configured values:")
+    print(elasticities.to_string(float_format="{:.4f}".format))
+
 
 if __name__ == "__main__":
     config_path = sys.argv[1] if len(sys.argv) > 1 else "configs/config_2c.json"
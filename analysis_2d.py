@@ -1,10 +1,10 @@
 import sys
 import json
-import pandas as pd
 import plotly.express as px
 
-from src.catching import attempt_catch
+from src.optimization import best_combinations
 from src.pokemon import PokemonFactory, StatusEffect
+from src.sweep import run_sweep, sweep_axes
 
 def run_analysis_2d(config_path="configs/config_2d.json"):
     with open(config_path, "r") as f:
@@ -25,54 +25,29 @@ def run_analysis_2d(config_path="configs/config_2d.json"):
     fixed_level = config["fixed_level"]
 
     factory = PokemonFactory("pokemon.json")
-    results = []
+    axes = sweep_axes(pokemon_list, statuses, hp_percentages, levels, pokeballs)
 
-    # Correr simulación para todas las combinaciones
-    for pkmn_name in pokemon_list:
-        for status_str in statuses:
-            status_effect = StatusEffect[status_str]
-            for hp_perc in hp_percentages:
-                for lvl in levels:
-                    for ball in pokeballs:
-                        for _ in range(num_experiments):
-                            poke = factory.create(
-                                pkmn_name,
-                                lvl,
-                                status_effect,
-                                hp_perc
-                            )
-                            _, capture_rate = attempt_catch(poke, ball, noise)
-                        results.append({
-                            "pokemon": pkmn_name,
-                            "status": status_str,
-                            "hp_perc": hp_perc,
-                            "level": lvl,
-                            "pokeball": ball,
-                            "capture_rate": capture_rate
-                        })
+    # Correr simulación para todas las combinaciones, cubo (pokemon, status, hp, level, pokeball)
+    cube = run_sweep(axes, num_experiments, noise, "capture_rate", factory=factory)
 
-    # Pasar resultados a DataFrame
-    df = pd.DataFrame(results)
     print("Resultados totales (primeras 1000 filas):")
-    print(df.head(100))
+    print(cube.to_frame("capture_rate").head(100))
 
-    # Imprimir la combinación óptima para cada pokemon en cada nivel
+    # Imprimir la combinación óptima para cada pokemon (sin ruido, sin simular)
     print("\nMejores combinaciones para cada Pokémon:")
-    for pkmn in df["pokemon"].unique():
-        df_pkmn = df[df["pokemon"] == pkmn]
-        max_rate = df_pkmn["capture_rate"].max()
-        best_combinations = df_pkmn[df_pkmn["capture_rate"] == max_rate]
+    best = best_combinations(pokemon_list, levels, config, by_level=False, factory=factory)
+    for pkmn, best_pkmn in best.groupby("pokemon", sort=False):
+        max_rate = best_pkmn["capture_rate"].iloc[0]
         print(f"\n{pkmn.capitalize()} - Mejor tasa de captura: {max_rate:.4f}")
-        print(best_combinations.to_string(index=False))
+        print(best_pkmn.to_string(index=False))
 
     # Generar gráficos por cada Pokémon
-    for pkmn in df["pokemon"].unique():
-        df_pkmn = df[df["pokemon"] == pkmn]
+    for pkmn in pokemon_list:
+        cube_pkmn = cube.sel(pokemon=pkmn)
 
         # ----------------------------
         # Variar HP (current_hp) manteniendo nivel y status fijos 
-        mask_hp = (df_pkmn["level"] == fixed_level) & (df_pkmn["status"] == fixed_status.name)
-        df_hp = df_pkmn[mask_hp]
+        df_hp = cube_pkmn.sel(level=fixed_level, status=fixed_status.name).to_frame("capture_rate")
         fig_hp = px.bar(
             df_hp,
             x="hp_perc",
@@ -86,8 +61,7 @@ def run_analysis_2d(config_path="configs/config_2d.json"):
 
         # ----------------------------
         # Variar Level manteniendo HP y status fijos
-        mask_level = (df_pkmn["hp_perc"] == fixed_hp) & (df_pkmn["status"] == fixed_status.name)
-        df_level = df_pkmn[mask_level]
+        df_level = cube_pkmn.sel(hp_perc=fixed_hp, status=fixed_status.name).to_frame("capture_rate")
         fig_level = px.line(
             df_level,
             x="level",
@@ -101,8 +75,7 @@ def run_analysis_2d(config_path="configs/config_2d.json"):
 
         # ----------------------------
         # Variar Status manteniendo HP y nivel fijos
-        mask_status = (df_pkmn["hp_perc"] == fixed_hp) & (df_pkmn["level"] == fixed_level)
-        df_status = df_pkmn[mask_status]
+        df_status = cube_pkmn.sel(hp_perc=fixed_hp, level=fixed_level).to_frame("capture_rate")
         fig_status = px.bar(
             df_status,
             x="status",
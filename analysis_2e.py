@@ -1,10 +1,13 @@
 import sys
 import json
-import pandas as pd
 import plotly.express as px
 
-from src.catching import attempt_catch
+from src.optimization import best_combinations
 from src.pokemon import PokemonFactory, StatusEffect
+from src.sweep import check_labels, run_sweep, sweep_axes
+
+# Paneles por fila en los gráficos facetados por nivel
+FACET_COLUMNS = 4
 
 def run_analysis_2e(config_path="configs/config_2e.json"):
     with open(config_path, "r") as f:
@@ -24,83 +27,59 @@ def run_analysis_2e(config_path="configs/config_2e.json"):
     fixed_hp = config["fixed_hp"]
 
     factory = PokemonFactory("pokemon.json")
-    results = []
+    axes = sweep_axes(pokemon_list, statuses, hp_percentages, levels, pokeballs)
+    # Los gráficos seleccionan estos valores fijos
+    check_labels(axes, status=fixed_status.name, hp_perc=fixed_hp)
 
-    # Correr simulación para todas las combinaciones
-    for pkmn_name in pokemon_list:
-        for status_str in statuses:
-            status_effect = StatusEffect[status_str]
-            for hp_perc in hp_percentages:
-                for lvl in levels:
-                    for ball in pokeballs:
-                        for _ in range(num_experiments):
-                            poke = factory.create(
-                                pkmn_name,
-                                lvl,
-                                status_effect,
-                                hp_perc
-                            )
-                            _, capture_rate = attempt_catch(poke, ball, noise)
-                        results.append({
-                            "pokemon": pkmn_name,
-                            "status": status_str,
-                            "hp_perc": hp_perc,
-                            "level": lvl,
-                            "pokeball": ball,
-                            "capture_rate": capture_rate
-                        })
+    # Correr simulación para todas las combinaciones, cubo (pokemon, status, hp, level, pokeball)
+    cube = run_sweep(axes, num_experiments, noise, "capture_rate", factory=factory)
 
-    # Pasar resultados a DataFrame
-    df = pd.DataFrame(results)
     print("Total results (first 100 rows):")
-    print(df.head(100))
+    print(cube.to_frame("capture_rate").head(100))
 
     # Imprimir la combinación óptima para cada pokemon en cada nivel
     print("\nOptimal combinations for each Pokémon at each level:")
-    for pkmn in df["pokemon"].unique():
-        for lvl in levels:
-            df_subset = df[(df["pokemon"] == pkmn) & (df["level"] == lvl)]
-            if not df_subset.empty:
-                max_rate = df_subset["capture_rate"].max()
-                best = df_subset[df_subset["capture_rate"] == max_rate]
-                print(f"\n{pkmn.capitalize()} at Level {lvl} - Best capture rate: {max_rate:.4f}")
-                print(best.to_string(index=False))
+    best_all = best_combinations(pokemon_list, levels, config, factory=factory)
+    for (pkmn, lvl), best in best_all.groupby(["pokemon", "level"], sort=False):
+        max_rate = best["capture_rate"].iloc[0]
+        print(f"\n{pkmn.capitalize()} at Level {lvl} - Best capture rate: {max_rate:.4f}")
+        print(best.to_string(index=False))
+
+    # Producir gráficos para cada pokemon, un panel por cada nivel de la configuración
+    for pkmn in pokemon_list:
+        cube_pkmn = cube.sel(pokemon=pkmn)
 
-    # Producir gráficos para cada pokemon en cada nivel que aparece en la configuración
-    for pkmn in df["pokemon"].unique():
-        df_pkmn = df[df["pokemon"] == pkmn]
-        for lvl in levels:
-            # -------------------------------------
-            # Plot 1: Variar HP percentage manteniendo status fijo y level = current level
-            mask_hp = (df_pkmn["level"] == lvl) & (df_pkmn["status"] == fixed_status.name)
-            df_hp = df_pkmn[mask_hp]
-            if not df_hp.empty:
-                fig_hp = px.bar(
-                    df_hp,
-                    x="hp_perc",
-                    y="capture_rate",
-                    color="pokeball",
-                    barmode="group",
-                    title=f"{pkmn.capitalize()} (Level = {lvl}): Capture Rate vs. HP Percentage\n(Status fixed at {fixed_status.name})",
-                    labels={"hp_perc": "HP Percentage", "capture_rate": "Capture Rate"}
-                )
-                fig_hp.show()
+        # -------------------------------------
+        # Plot 1: Variar HP percentage manteniendo status fijo, un panel por nivel
+        df_hp = cube_pkmn.sel(status=fixed_status.name).to_frame("capture_rate")
+        fig_hp = px.bar(
+            df_hp,
+            x="hp_perc",
+            y="capture_rate",
+            color="pokeball",
+            barmode="group",
+            facet_col="level",
+            facet_col_wrap=FACET_COLUMNS,
+            title=f"{pkmn.capitalize()}: Capture Rate vs. HP Percentage by Level\n(Status fixed at {fixed_status.name})",
+            labels={"hp_perc": "HP Percentage", "capture_rate": "Capture Rate", "level": "Level"}
+        )
+        fig_hp.show()
 
-            # -------------------------------------
-            # Gráfico 2: Variar Status manteniendo HP fijo y level = current level
-            mask_status = (df_pkmn["level"] == lvl) & (df_pkmn["hp_perc"] == fixed_hp)
-            df_status = df_pkmn[mask_status]
-            if not df_status.empty:
-                fig_status = px.bar(
-                    df_status,
-                    x="status",
-                    y="capture_rate",
-                    color="pokeball",
-                    barmode="group",
-                    title=f"{pkmn.capitalize()} (Level = {lvl}): Capture Rate vs. Status\n(HP fixed at {fixed_hp*100:.0f}%)",
-                    labels={"status": "Status", "capture_rate": "Capture Rate"}
-                )
-                fig_status.show()
+        # -------------------------------------
+        # Gráfico 2: Variar Status manteniendo HP fijo, un panel por nivel
+        df_status = cube_pkmn.sel(hp_perc=fixed_hp).to_frame("capture_rate")
+        fig_status = px.bar(
+            df_status,
+            x="status",
+            y="capture_rate",
+            color="pokeball",
+            barmode="group",
+            facet_col="level",
+            facet_col_wrap=FACET_COLUMNS,
+            title=f"{pkmn.capitalize()}: Capture Rate vs. Status by Level\n(HP fixed at {fixed_hp*100:.0f}%)",
+            labels={"status": "Status", "capture_rate": "Capture Rate", "level": "Level"}
+        )
+        fig_status.show()
 
 if __name__ == "__main__":
     config_path = sys.argv[1] if len(sys.argv) > 1 else "configs/config_2e.json"
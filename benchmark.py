@@ -0,0 +1,89 @@
+import json
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+from src.pokemon import PokemonFactory
+from src.sweep import run_sweep, sweep_axes
+from src.trace import ThrowTracer, read_trace, replay
+
+DTYPES = (np.float64, np.float32)
+REPEATS = 3
+
+
+def _best_time(func, repeats=REPEATS):
+    best = np.inf
+    for _ in range(repeats):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def run_benchmark(config_path="configs/config_2c.json"):
+    with open(config_path, "r") as f:
+        config = json.load(f)["analysis"]
+
+    # Parametros de la configuración, con ruido para que haya sorteos que comparar
+    num_experiments = config["num_experiments"]
+    noise = config["noise"] or 0.15
+    factory = PokemonFactory("pokemon.json")
+    axes = sweep_axes(
+        config["pokemon"],
+        config["statuses"],
+        config["hp_percentages"],
+        config["levels"],
+        config["pokeballs"],
+    )
+    # Sin deduplicar, así cada celda simula sus propios tiros
+    throws = num_experiments * int(np.prod([len(v) for v in axes.values()]))
+
+    # ----------------------------
+    # Rendimiento de cada precisión
+    print(f"Barrido de {throws} tiros (ruido {noise})")
+    results = {}
+    for dtype in DTYPES:
+        def sweep():
+            return run_sweep(
+                axes, num_experiments, noise, factory=factory, dedupe=False, dtype=dtype
+            )
+
+        seconds = _best_time(sweep)
+        results[dtype] = sweep().values
+        print(f"{np.dtype(dtype).name:>8}: {seconds:.3f} s, {throws / seconds / 1e6:.1f} M tiros/s")
+
+    # ----------------------------
+    # Validación contra float64
+    print("\nDesvío máximo de float32 respecto de float64")
+
+    # Cada cubo en su precisión, uno de float32 ocultaría el desvío
+    exact = {
+        dtype: run_sweep(axes, 1, 0.0, "capture_rate", factory=factory, dtype=dtype).values
+        for dtype in DTYPES
+    }
+    print(f"Capture rate sin ruido: {np.abs(exact[np.float32] - exact[np.float64]).max():.2e}")
+
+    # Los mismos sorteos de float32 evaluados con la fórmula en float64
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "trace.gz")
+        with ThrowTracer(path) as tracer:
+            run_sweep(axes, num_experiments, noise, factory=factory, tracer=tracer, dtype=np.float32)
+        records = read_trace(path)
+    success, rate = replay(records, np.float64)
+    print(f"Capture rate con ruido (mismos sorteos): {np.abs(rate - records['capture_rate']).max():.2e}")
+    print(f"Tiros con resultado distinto: {np.count_nonzero(success != records['success'])} de {len(records)}")
+
+    # Distintos sorteos: diferencia de la tasa de éxito en errores estándar
+    p = (results[np.float64] + results[np.float32]) / 2
+    standard_error = np.sqrt(2 * p * (1 - p) / num_experiments)
+    difference = np.abs(results[np.float32] - results[np.float64])
+    with np.errstate(divide="ignore", invalid="ignore"):
+        z = np.where(standard_error > 0, difference / standard_error, 0)
+    print(f"Tasa de éxito: {difference.max():.2e} (máximo {z.max():.2f} errores estándar)")
+
+
+if __name__ == "__main__":
+    run_benchmark(*sys.argv[1:])
@@ -0,0 +1,188 @@
+import json
+import operator
+from bisect import bisect_left, bisect_right
+from pathlib import Path
+from typing import Callable, Dict, FrozenSet, List, Optional, Sequence, Set, Tuple
+
+import numpy as np
+
+from .pokemon import Pokemon, Stats, StatusEffect, Type
+
+DEFAULT_POKEBALLS_FILE = Path(__file__).resolve().parent.parent / "pokeballs.json"
+
+# Categorical attributes are stored as positions in these lists
+TYPE_CODES = {t: i for i, t in enumerate(Type)}
+STATUS_CODES = {s: i for i, s in enumerate(StatusEffect)}
+
+_NUMERIC = set(Stats._fields) | {"weight", "level", "catch_rate"}
+_TARGETS = ("catch_rate", "ball_rate")
+_OPS = {"add": np.add, "multiply": np.multiply}
+_SCALAR_OPS = {"add": operator.add, "multiply": operator.mul}
+
+Attributes = Dict[str, np.ndarray]
+Rule = Callable[[Attributes], np.ndarray]
+# The same rule for a single pokemon in plain Python, without NumPy overhead
+ScalarRule = Callable[[Pokemon], float]
+
+
+def _plain_attributes(pokemon: Pokemon, level=None, status=None) -> dict:
+    t1, t2 = pokemon.type
+    attributes = dict(pokemon.stats._asdict())
+    attributes.update(
+        weight=pokemon.weight,
+        catch_rate=pokemon.catch_rate,
+        level=pokemon.level if level is None else level,
+        status=STATUS_CODES[pokemon.status_effect] if status is None else status,
+        type1=TYPE_CODES[t1],
+        type2=TYPE_CODES[t2],
+    )
+    return attributes
+
+
+def pokemon_attributes(pokemon: Pokemon, level=None, status=None) -> Attributes:
+    """Formula attributes of a pokemon as rules see them
+
+    `level` and `status` (StatusEffect codes) may be arrays to evaluate the
+    same species at many levels or statuses at once.
+    """
+    return {k: np.asarray(v) for k, v in _plain_attributes(pokemon, level, status).items()}
+
+
+def batch_attributes(pokemon: Sequence[Pokemon]) -> Attributes:
+    """Formula attributes of many pokemon, one entry per pokemon"""
+    rows = [_plain_attributes(pkmn) for pkmn in pokemon]
+    return {k: np.array([row[k] for row in rows]) for k in (rows[0] if rows else ())}
+
+
+def _scalar_attribute(pokemon: Pokemon, name: str):
+    if name in Stats._fields:
+        return getattr(pokemon.stats, name)
+    return getattr(pokemon, name)
+
+
+def _compile_step(rule: dict) -> Tuple[Rule, ScalarRule]:
+    """Piecewise constant modifier over sorted breakpoints of a numeric attribute"""
+    on = rule["on"]
+    if on not in _NUMERIC:
+        raise ValueError(f"Unknown attribute {on!r}")
+    breakpoints = np.asarray(rule["breakpoints"], dtype=np.float64)
+    values = np.asarray(rule["values"], dtype=np.float64)
+    if values.size != breakpoints.size + 1 or np.any(np.diff(breakpoints) <= 0):
+        raise ValueError(f"{on!r} needs increasing breakpoints and one value more")
+    # inclusive: a value equal to a breakpoint already takes the next step
+    side = "right" if rule.get("inclusive", False) else "left"
+    bisect = bisect_right if side == "right" else bisect_left
+    scalar_breakpoints, scalar_values = breakpoints.tolist(), values.tolist()
+
+    return (
+        lambda attrs: values[np.searchsorted(breakpoints, attrs[on], side=side)],
+        lambda pokemon: scalar_values[bisect(scalar_breakpoints, _scalar_attribute(pokemon, on))],
+    )
+
+
+def _compile_status(rule: dict) -> Tuple[Rule, ScalarRule]:
+    """Modifier looked up by status effect"""
+    table = np.full(len(STATUS_CODES), rule.get("otherwise", 1), dtype=np.float64)
+    for status, value in rule["values"].items():
+        table[STATUS_CODES[StatusEffect[status.upper()]]] = value
+    scalar_table = dict(zip(StatusEffect, table.tolist()))
+
+    return (
+        lambda attrs: table[attrs["status"]],
+        lambda pokemon: scalar_table[pokemon.status_effect],
+    )
+
+
+def _compile_type(rule: dict) -> Tuple[Rule, ScalarRule]:
+    """Modifier applied when either of the pokemon's types is listed"""
+    matches = np.zeros(len(TYPE_CODES), dtype=bool)
+    for t in rule["types"]:
+        matches[TYPE_CODES[Type(t.lower())]] = True
+    value, otherwise = rule["value"], rule.get("otherwise", 1)
+    types = {t for t in TYPE_CODES if matches[TYPE_CODES[t]]}
+
+    return (
+        lambda attrs: np.where(matches[attrs["type1"]] | matches[attrs["type2"]], value, otherwise),
+        lambda pokemon: value if types.intersection(pokemon.type) else otherwise,
+    )
+
+
+def _reads(rule: dict) -> Set[str]:
+    """Attributes a rule looks up"""
+    if rule["on"] == "type":
+        return {"type1", "type2"}
+    return {rule["on"]}
+
+
+def _compile_rule(rule: dict) -> Tuple[str, str, Rule, ScalarRule]:
+    target = rule.get("target", "catch_rate")
+    if target not in _TARGETS:
+        raise ValueError(f"target has to be one of {_TARGETS}")
+    op = rule.get("op", "multiply")
+    if op not in _OPS:
+        raise ValueError(f"op has to be one of {tuple(_OPS)}")
+
+    if rule["on"] == "status":
+        return (target, op, *_compile_status(rule))
+    if rule["on"] == "type":
+        return (target, op, *_compile_type(rule))
+    return (target, op, *_compile_step(rule))
+
+
+class CompiledBall:
+    """Pokeball definition compiled to NumPy expressions
+
+    Rules are applied in order to the pokemon's catch rate and to the ball
+    rate, each one adding or multiplying a modifier that is looked up for a
+    whole array of pokemon at once. evaluate_pokemon applies the same rules
+    to a single pokemon in plain Python.
+    """
+
+    def __init__(self, key: str, definition: dict):
+        self.key = key
+        self.name = definition.get("name", key)
+        self.ball_rate = definition.get("ball_rate", 1)
+        self.min_catch_rate = definition.get("min_catch_rate")
+        rules = definition.get("rules", [])
+        self._rules: List[Tuple[str, str, Rule, ScalarRule]] = [
+            _compile_rule(rule) for rule in rules
+        ]
+        # Attributes evaluate() reads, callers only need to gather these
+        self.attributes: FrozenSet[str] = frozenset(
+            {"catch_rate"}.union(*(_reads(rule) for rule in rules))
+        )
+
+    def evaluate(self, attributes: Attributes) -> Tuple[np.ndarray, np.ndarray]:
+        """Returns the broadcast (catch_rate, ball_rate) arrays for the attributes"""
+        rates = {
+            "catch_rate": np.asarray(attributes["catch_rate"], dtype=np.float64),
+            "ball_rate": np.asarray(self.ball_rate, dtype=np.float64),
+        }
+        for target, op, rule, _ in self._rules:
+            rates[target] = _OPS[op](rates[target], rule(attributes))
+
+        catch_rate = rates["catch_rate"]
+        if self.min_catch_rate is not None:
+            catch_rate = np.maximum(catch_rate, self.min_catch_rate)
+        return catch_rate, rates["ball_rate"]
+
+    def evaluate_pokemon(self, pokemon: Pokemon) -> Tuple[float, float]:
+        """Returns the (catch_rate, ball_rate) of a single pokemon, see evaluate"""
+        rates = {"catch_rate": pokemon.catch_rate, "ball_rate": self.ball_rate}
+        for target, op, _, rule in self._rules:
+            rates[target] = _SCALAR_OPS[op](rates[target], rule(pokemon))
+
+        catch_rate = rates["catch_rate"]
+        if self.min_catch_rate is not None:
+            catch_rate = max(catch_rate, self.min_catch_rate)
+        return catch_rate, rates["ball_rate"]
+
+    def __repr__(self):
+        return f"CompiledBall({self.name}, rules={len(self._rules)})"
+
+
+def load_pokeballs(path: Optional[str] = None) -> Dict[str, CompiledBall]:
+    """Loads and compiles every pokeball definition of a JSON file"""
+    with open(path or DEFAULT_POKEBALLS_FILE, "r") as f:
+        definitions = json.load(f)
+    return {key.lower(): CompiledBall(key.lower(), d) for key, d in definitions.items()}
@@ -1,18 +1,183 @@
 import random
-from typing import Tuple
+from typing import Sequence, Tuple
 
 import numpy as np
 
-from .pokeball import BasePokeball, FastBall, HeavyBall, PokeBall, UltraBall
+from .ball_rules import batch_attributes, load_pokeballs
+from .pokeball import BasePokeball, RuleBall
 from .pokemon import Pokemon
 
+# Every ball compiled from pokeballs.json, the file also defines the balls
+# that used to be classes so its definition is the one that counts
+COMPILED_POKEBALLS = load_pokeballs()
 _POKEBALL = {
-    "pokeball": lambda x: PokeBall(x),
-    "ultraball": lambda x: UltraBall(x),
-    "fastball": lambda x: FastBall(x),
-    "heavyball": lambda x: HeavyBall(x),
+    key: (lambda x, d=definition: RuleBall(x, d)) for key, definition in COMPILED_POKEBALLS.items()
 }
 
+# Python and NumPy scalars, capture_rate skips NumPy when every input is one
+_SCALARS = (int, float, np.generic)
+
+
+def _scalar_capture_rate(max_hp, curr_hp, catch_rate, ball_rate, status, noise_multiplier=1.0):
+    """capture_rate of plain numbers in pure Python, the per-throw hot path"""
+    numerator = 1 + (max_hp * 3 - curr_hp * 2) * catch_rate * ball_rate * status
+    denominator = max_hp * 3
+    return min(round(float(numerator / denominator) / 256, 4) * noise_multiplier, 1)
+
+
+def capture_rate(max_hp, curr_hp, catch_rate, ball_rate, status, noise_multiplier=1.0):
+    """Closed-form capture rate, works on scalars or broadcastable numpy arrays
+
+    Parameters
+    ----------
+    max_hp, curr_hp::[float | np.ndarray]
+        Max and current hp of the pokemon
+    catch_rate, ball_rate::[float | np.ndarray]
+        Catch rate as modified by the pokeball and the pokeball's own rate
+    status::[float | np.ndarray]
+        Status effect multiplier
+    noise_multiplier::[float | np.ndarray]
+        Multiplicative noise applied to the rounded rate
+
+    Returns
+    -------
+    capture_rate::[float | np.ndarray]
+        The probability of the pokemon being caught, capped at 1
+
+    Scalars are rounded with Python's round like attempt_catch always did.
+    Arrays, 0-d ones included, use np.round, which scales by 10^4 before rounding and may land 1e-4
+    away on exact ties (26 of 1.2M noiseless grid points)
+    """
+    inputs = (max_hp, curr_hp, catch_rate, ball_rate, status, noise_multiplier)
+    if all(isinstance(x, _SCALARS) for x in inputs):
+        return _scalar_capture_rate(*inputs)
+
+    numerator = 1 + (max_hp * 3 - curr_hp * 2) * catch_rate * ball_rate * status
+    denominator = max_hp * 3
+    return np.minimum(np.round((numerator / denominator) / 256, 4) * noise_multiplier, 1)
+
+
+def ball_modifiers(pokemon: Pokemon, pokeball_type: str) -> Tuple[float, float]:
+    """Returns the (catch_rate, ball_rate) pair a pokeball applies to a pokemon"""
+    if pokeball_type.lower() not in _POKEBALL:
+        raise ValueError("Invalid pokeball type")
+
+    pokeball: BasePokeball = _POKEBALL[pokeball_type.lower()](pokemon)
+    return pokeball.catch_rate, pokeball.ball_rate
+
+
+def ball_modifiers_batch(attributes, pokeball_type: str) -> Tuple[np.ndarray, np.ndarray]:
+    """Vectorized ball_modifiers over arrays of pokemon attributes
+
+    See ball_rules.pokemon_attributes for the attributes a ball can read
+    """
+    if pokeball_type.lower() not in COMPILED_POKEBALLS:
+        raise ValueError("Invalid pokeball type")
+
+    return COMPILED_POKEBALLS[pokeball_type.lower()].evaluate(attributes)
+
+
+def catch_probability(pokemon: Pokemon, pokeball_type: str) -> float:
+    """Noiseless probability of a single throw catching the pokemon"""
+    catch_rate, ball_rate = ball_modifiers(pokemon, pokeball_type)
+    status = pokemon.status_effect.value[1]
+
+    return float(
+        _scalar_capture_rate(pokemon.max_hp, pokemon.current_hp, catch_rate, ball_rate, status)
+    )
+
+
+def catch_probability_batch(pokemon: Sequence[Pokemon], pokeball_types: Sequence[str]) -> np.ndarray:
+    """Vectorized catch_probability of every pokemon with every pokeball
+
+    Returns a (n_pokemon, n_pokeballs) array. The rate is rounded with
+    np.round, so exact ties may land 1e-4 away from catch_probability, see
+    capture_rate
+    """
+    p = np.zeros((len(pokemon), len(pokeball_types)))
+    if not len(pokemon):
+        return p
+    attributes = batch_attributes(pokemon)
+    max_hp = np.array([pkmn.max_hp for pkmn in pokemon], dtype=np.float64)
+    curr_hp = np.array([pkmn.current_hp for pkmn in pokemon], dtype=np.float64)
+    status = np.array([pkmn.status_effect.value[1] for pkmn in pokemon], dtype=np.float64)
+
+    for j, ball in enumerate(pokeball_types):
+        catch_rate, ball_rate = ball_modifiers_batch(attributes, ball)
+        p[:, j] = capture_rate(max_hp, curr_hp, catch_rate, ball_rate, status)
+    return p
+
+
+def throw_draws(rng, shape, noise=0.0, dtype=np.float64):
+    """Noise multipliers and uniforms of a batch of throws, in the order drawn
+
+    Replaying a trace calls this with the recorded generator state, so it is
+    the single place where attempt_catch_batch consumes random numbers.
+    """
+    noise_multiplier = np.dtype(dtype).type(1)
+    if noise:
+        noise_multiplier = 1 + noise * rng.standard_normal(shape, dtype=dtype)
+        noise_multiplier = np.maximum(noise_multiplier, 0)
+    return noise_multiplier, rng.random(shape, dtype=dtype)
+
+
+def attempt_catch_batch(
+    max_hp,
+    curr_hp,
+    catch_rate,
+    ball_rate,
+    status,
+    noise=0.0,
+    rng=None,
+    tracer=None,
+    tag=0,
+    dtype=np.float64,
+) -> Tuple[np.ndarray, np.ndarray]:
+    """Vectorized attempt_catch over broadcastable arrays of formula inputs
+
+    Parameters
+    ----------
+    max_hp, curr_hp, catch_rate, ball_rate, status::[np.ndarray]
+        Formula inputs of every throw, see capture_rate
+    noise::float
+        Standard deviation of the multiplicative noise
+    rng::[np.random.Generator]
+        Random generator, defaults to a fresh one
+    tracer::[trace.ThrowTracer]
+        Records the inputs of the batch and the generator state its draws
+        start from, enough to rebuild every throw
+    tag::[int | np.ndarray]
+        Id stored with the recorded throws, broadcastable to the throws
+    dtype::[np.dtype]
+        Floating point type of the draws and the formula, np.float32 halves
+        the memory traffic of large batches
+
+    Returns
+    -------
+    attempt_success::np.ndarray[bool]
+        True where the pokemon was caught
+
+    capture_rate::np.ndarray[float]
+        The probability of each pokemon being caught
+    """
+    rng = rng or np.random.default_rng()
+    inputs = tuple(
+        np.asarray(x, dtype=dtype) for x in (max_hp, curr_hp, catch_rate, ball_rate, status)
+    )
+    max_hp, curr_hp, catch_rate, ball_rate, status = inputs
+    shape = np.broadcast_shapes(*(np.shape(x) for x in inputs))
+
+    state = rng.bit_generator.state if tracer is not None else None
+    noise_multiplier, uniform = throw_draws(rng, shape, noise, dtype)
+
+    rate = capture_rate(max_hp, curr_hp, catch_rate, ball_rate, status, noise_multiplier)
+    rate = np.broadcast_to(rate, shape)
+    success = uniform < rate
+
+    if tracer is not None:
+        tracer.record(inputs, success, state, noise, tag)
+    return (success, rate)
+
 
 def attempt_catch(
     pokemon: Pokemon, pokeball_type: str, noise=0.0
@@ -48,15 +213,12 @@ def attempt_catch(
     # Get the property value from the enum, value[0] would be the name
     status = pokemon.status_effect.value[1]
 
-    numerator = 1 + (max_hp * 3 - curr_hp * 2) * catch_rate * ball_rate * status
-    denominator = max_hp * 3
-
     noise_multiplier = np.random.normal(1, noise)
     if noise_multiplier < 0:
         noise_multiplier = 0
 
-    capture_rate = round((numerator / denominator) / 256, 4) * noise_multiplier
-    if capture_rate > 1:
-        capture_rate = 1
+    rate = float(
+        _scalar_capture_rate(max_hp, curr_hp, catch_rate, ball_rate, status, noise_multiplier)
+    )
 
-    return (random.uniform(0, 1) < capture_rate, capture_rate)
+    return (random.uniform(0, 1) < rate, rate)
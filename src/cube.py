@@ -0,0 +1,220 @@
+import json
+import os
+import shutil
+from typing import Dict, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+
+from .results import grid_frame
+
+
+def _sidecar(path: str) -> str:
+    return f"{path}.json"
+
+
+def _slabs(path: str) -> str:
+    # One empty file per written slab, so workers never rewrite shared state
+    return f"{path}.slabs"
+
+
+def _to_json(labels: Sequence) -> list:
+    # numpy scalars are not JSON serializable
+    return [label.item() if isinstance(label, np.generic) else label for label in labels]
+
+
+class ResultCube:
+    """Dense result array with labelled axes
+
+    Axes are kept in order, e.g. (pokemon, status, hp_perc, level, pokeball),
+    and every label maps to its position so selecting by label is a dict
+    lookup plus basic indexing. Selecting single labels returns views, which
+    for memory-mapped cubes only read the selected slice from disk.
+
+    Memory-mapped cubes keep the parameters of the run that fills them in
+    their sidecar. Each slab of the first axis is recorded once written, see
+    mark_written, and the cube is complete when every slab is, whichever
+    process wrote it.
+    """
+
+    def __init__(
+        self,
+        axes: Dict[str, Sequence],
+        values: np.ndarray,
+        meta: Optional[dict] = None,
+        path: Optional[str] = None,
+    ):
+        self._axes = {name: list(labels) for name, labels in axes.items()}
+        shape = tuple(len(labels) for labels in self._axes.values())
+        if values.shape != shape:
+            raise ValueError(f"values have shape {values.shape}, axes expect {shape}")
+        self._values = values
+        self._meta = meta or {}
+        self._path = path
+        self._positions = {
+            name: {label: i for i, label in enumerate(labels)}
+            for name, labels in self._axes.items()
+        }
+
+    @classmethod
+    def create(
+        cls,
+        path: str,
+        axes: Dict[str, Sequence],
+        dtype=np.float32,
+        fill=np.nan,
+        meta: Optional[dict] = None,
+    ) -> "ResultCube":
+        """Creates a memory-mapped cube at `path` with a JSON sidecar of the axes
+
+        `meta` holds the JSON serializable parameters of the run. The cube is
+        incomplete until every slab is marked written.
+        """
+        axes = {name: _to_json(labels) for name, labels in axes.items()}
+        shape = tuple(len(labels) for labels in axes.values())
+        values = np.memmap(path, dtype=dtype, mode="w+", shape=shape)
+        values[...] = fill
+        # Slabs written by an earlier run don't count for the new file
+        shutil.rmtree(_slabs(path), ignore_errors=True)
+        os.makedirs(_slabs(path))
+
+        cube = cls(axes, values, meta, path)
+        cube._write_sidecar()
+        return cube
+
+    @classmethod
+    def open(cls, path: str, mode: str = "r") -> "ResultCube":
+        """Opens a cube written by create, "r+" lets workers fill their slices"""
+        with open(_sidecar(path), "r") as f:
+            sidecar = json.load(f)
+        values = np.memmap(
+            path, dtype=sidecar["dtype"], mode=mode, shape=tuple(sidecar["shape"])
+        )
+        return cls(sidecar["axes"], values, sidecar.get("meta"), path)
+
+    def _write_sidecar(self):
+        with open(_sidecar(self._path), "w") as f:
+            json.dump(
+                {
+                    "dtype": self._values.dtype.name,
+                    "shape": list(self.shape),
+                    "axes": self._axes,
+                    "meta": self._meta,
+                },
+                f,
+            )
+
+    def mark_written(self, label):
+        """Records the slab `label` of the first axis as written, after flushing it
+
+        Each worker filling a shared file marks its own slabs, so no process
+        has to know when the others are done.
+        """
+        position = self.position(self.dims[0], label)
+        if self._path is not None:
+            self.flush()
+            open(os.path.join(_slabs(self._path), str(position)), "w").close()
+
+    def matches(self, axes: Dict[str, Sequence], meta: Optional[dict] = None) -> bool:
+        """Whether the cube is complete and holds the results of this grid and run"""
+        axes = {name: _to_json(labels) for name, labels in axes.items()}
+        return self._axes == axes and self._meta == (meta or {}) and self.complete
+
+    @property
+    def axes(self) -> Dict[str, list]:
+        return self._axes
+
+    @property
+    def dims(self) -> list:
+        return list(self._axes)
+
+    @property
+    def meta(self) -> dict:
+        return self._meta
+
+    @property
+    def complete(self) -> bool:
+        """Whether every slab is written, always True for in-memory cubes"""
+        if self._path is None:
+            return True
+        written = os.listdir(_slabs(self._path)) if os.path.isdir(_slabs(self._path)) else []
+        return len(written) == self.shape[0]
+
+    @property
+    def values(self) -> np.ndarray:
+        return self._values
+
+    @property
+    def shape(self) -> tuple:
+        return self._values.shape
+
+    def position(self, dim: str, label) -> int:
+        """Position of `label` along `dim`"""
+        try:
+            return self._positions[dim][label]
+        except KeyError:
+            raise KeyError(f"{label!r} is not a label of {dim!r}") from None
+
+    def sel(self, **labels) -> "ResultCube":
+        """Selects by label, a single label drops its axis and a list keeps it
+
+        Single labels only use basic indexing so the result is a view.
+        """
+        unknown = set(labels) - set(self._axes)
+        if unknown:
+            raise KeyError(f"Unknown axes {sorted(unknown)}")
+
+        values = self._values
+        axes = {}
+        # Index the last axes first so earlier axis numbers stay valid
+        for n, (dim, axis_labels) in reversed(list(enumerate(self._axes.items()))):
+            if dim not in labels:
+                axes[dim] = axis_labels
+                continue
+            selected = labels[dim]
+            index = (slice(None),) * n
+            if isinstance(selected, (list, tuple, np.ndarray)):
+                positions = [self.position(dim, label) for label in selected]
+                values = values[index + (positions,)]
+                axes[dim] = list(selected)
+            else:
+                values = values[index + (self.position(dim, selected),)]
+
+        return ResultCube(dict(reversed(list(axes.items()))), values)
+
+    def axis(self, dim: str) -> int:
+        """Axis number of `dim`"""
+        return self.dims.index(dim)
+
+    def relative_spread(self, dim: str) -> "ResultCube":
+        """(max - min) / mean along `dim` in percent, 0 where the mean is 0"""
+        axis = self.axis(dim)
+        values = np.asarray(self._values, dtype=np.float64)
+        spread = values.max(axis=axis) - values.min(axis=axis)
+        mean = values.mean(axis=axis)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            spread = np.where(mean != 0, spread / mean * 100, 0)
+        axes = {name: labels for name, labels in self._axes.items() if name != dim}
+        return ResultCube(axes, spread)
+
+    def to_table(self) -> pd.DataFrame:
+        """Two dimensional cube as a DataFrame, first axis as index"""
+        if len(self._axes) != 2:
+            raise ValueError("to_table needs a cube with exactly two axes")
+        (index_name, index), (columns_name, columns) = self._axes.items()
+        table = pd.DataFrame(np.asarray(self._values), index=index, columns=columns)
+        table.index.name, table.columns.name = index_name, columns_name
+        return table
+
+    def flush(self):
+        """Writes pending changes of a memory-mapped cube to disk"""
+        if isinstance(self._values, np.memmap):
+            self._values.flush()
+
+    def to_frame(self, name: str = "value") -> pd.DataFrame:
+        """Long compact DataFrame of the cube, see grid_frame"""
+        return grid_frame(self._axes, **{name: np.asarray(self._values)})
+
+    def __repr__(self):
+        dims = ", ".join(f"{dim}: {len(labels)}" for dim, labels in self._axes.items())
+        return f"ResultCube({dims}, dtype={self._values.dtype})"
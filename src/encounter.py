@@ -0,0 +1,215 @@
+from typing import Dict, List, NamedTuple, Optional, Sequence, Union
+
+import numpy as np
+
+from .catching import catch_probability_batch
+from .pokemon import Pokemon
+
+
+class Encounters(NamedTuple):
+    throws: np.ndarray  # Balls thrown in each encounter
+    caught: np.ndarray  # Whether the encounter ended in a capture
+
+
+class EncounterSummary(NamedTuple):
+    balls: List[str]  # Ball used on each throw of the head, the last one repeats
+    throw_probabilities: np.ndarray  # Per throw catch probability of the head
+    catch_probability: np.ndarray  # Probability of catching within max_throws
+    expected_throws: np.ndarray  # Expected balls spent, escapes spend max_throws
+    expected_throws_if_caught: np.ndarray  # Expected throws of successful encounters
+    expected_spend: Dict[str, np.ndarray]  # Expected balls spent of each type
+    max_throws: int
+
+    def cdf(self, throws) -> np.ndarray:
+        """Probability of the pokemon being caught within `throws` throws"""
+        return 1 - _survival(self.throw_probabilities, np.minimum(throws, self.max_throws))
+
+    def quantile(self, q) -> np.ndarray:
+        """Smallest number of throws catching the pokemon with probability >= q
+
+        `q` is a scalar, returns max_throws + 1 where q is not reached within
+        max_throws
+        """
+        p = self.throw_probabilities
+        head = p.shape[-1] - 1
+        head_cdf = 1 - np.cumprod(1 - p[..., :head], axis=-1)
+        q = np.asarray(q)[..., None]
+
+        # Caught during the head: first throw whose cdf reaches q
+        in_head = np.sum(head_cdf < q, axis=-1) + 1
+
+        # Otherwise solve 1 - S_h * (1 - p_last)^t >= q for the tail length t
+        survival_h = np.prod(1 - p[..., :head], axis=-1)
+        p_last = p[..., -1]
+        q = q[..., 0]
+        with np.errstate(divide="ignore", invalid="ignore"):
+            tail = np.ceil(np.log((1 - q) / survival_h) / np.log1p(-p_last))
+        tail = np.where(p_last >= 1, 1, np.maximum(tail, 1))
+        tail = np.where(np.isfinite(tail), tail, self.max_throws + 1)
+        throws = np.where(in_head <= head, in_head, head + tail)
+
+        return np.minimum(throws, self.max_throws + 1).astype(np.int64)
+
+
+def _as_batch(pokemon: Union[Pokemon, Sequence[Pokemon]]):
+    if isinstance(pokemon, Pokemon):
+        return [pokemon], True
+    return list(pokemon), False
+
+
+def _ball_list(ball_sequence: Union[str, Sequence[str]], max_throws: int) -> List[str]:
+    """Per throw balls of the head, the last ball is thrown until max_throws"""
+    if max_throws < 1:
+        raise ValueError("max_throws has to be at least 1")
+    balls = [ball_sequence] if isinstance(ball_sequence, str) else list(ball_sequence)
+    if not balls:
+        raise ValueError("ball_sequence can't be empty")
+    return [b.lower() for b in balls[:max_throws]]
+
+
+def _survival(p: np.ndarray, throws) -> np.ndarray:
+    """Probability of not being caught after `throws` throws, head then geometric tail"""
+    head = p.shape[-1] - 1
+    throws = np.asarray(throws)
+    thrown = np.arange(head) < throws[..., None]
+    survival_h = np.prod(np.where(thrown, 1 - p[..., :head], 1), axis=-1)
+    return survival_h * (1 - p[..., -1]) ** np.maximum(throws - head, 0)
+
+
+def throw_probabilities(
+    pokemon: Union[Pokemon, Sequence[Pokemon]], ball_sequence: Union[str, Sequence[str]]
+) -> np.ndarray:
+    """Noiseless catch probability of each throw for each pokemon
+
+    Returns an array with one row per pokemon and one column per ball of
+    `ball_sequence`, see catching.catch_probability_batch
+    """
+    batch, single = _as_batch(pokemon)
+    balls = [ball_sequence] if isinstance(ball_sequence, str) else list(ball_sequence)
+
+    # The probability only depends on the ball type, not on its position
+    distinct = list(dict.fromkeys(b.lower() for b in balls))
+    per_ball = catch_probability_batch(batch, distinct)
+    p = per_ball[:, [distinct.index(b.lower()) for b in balls]]
+    return p[0] if single else p
+
+
+def encounter_summary(
+    pokemon: Union[Pokemon, Sequence[Pokemon]],
+    ball_sequence: Union[str, Sequence[str]],
+    max_throws: int,
+) -> EncounterSummary:
+    """Exact throws-to-catch statistics of an encounter
+
+    Balls are thrown following `ball_sequence` and the last ball is repeated
+    until the pokemon is caught or `max_throws` balls were thrown. Throws are
+    independent, so past the sequence the throws to catch are geometric and
+    every statistic has a closed form.
+
+    Parameters
+    ----------
+    pokemon::[Pokemon | list[Pokemon]]
+        The pokemon being caught, a list evaluates every pokemon at once
+    ball_sequence::[str | list[str]]
+        Pokeball types in throwing order
+    max_throws::int
+        Throws before the pokemon flees
+
+    Returns
+    -------
+    summary::EncounterSummary
+        Arrays with one entry per pokemon (scalars for a single pokemon)
+    """
+    balls = _ball_list(ball_sequence, max_throws)
+    p = throw_probabilities(pokemon, balls)
+
+    head = len(balls) - 1
+    tail = max_throws - head
+    survival = np.concatenate(
+        [np.ones(p.shape[:-1] + (1,)), np.cumprod(1 - p[..., :head], axis=-1)], axis=-1
+    )
+    survival_h = survival[..., -1]
+    p_last = p[..., -1]
+    escape = survival_h * (1 - p_last) ** tail
+
+    # Throws are spent while the pokemon is still free: sum of survival
+    with np.errstate(divide="ignore", invalid="ignore"):
+        tail_throws = np.where(p_last > 0, (1 - (1 - p_last) ** tail) / p_last, tail)
+    expected_spend: Dict[str, np.ndarray] = {}
+    for k, ball in enumerate(balls):
+        spent = survival_h * tail_throws if k == head else survival[..., k]
+        expected_spend[ball] = expected_spend.get(ball, 0) + spent
+    expected_throws = sum(expected_spend.values())
+
+    catch = 1 - escape
+    with np.errstate(divide="ignore", invalid="ignore"):
+        if_caught = np.where(catch > 0, (expected_throws - max_throws * escape) / catch, np.nan)
+
+    return EncounterSummary(
+        balls=balls,
+        throw_probabilities=p,
+        catch_probability=catch,
+        expected_throws=expected_throws,
+        expected_throws_if_caught=if_caught,
+        expected_spend=expected_spend,
+        max_throws=max_throws,
+    )
+
+
+def simulate_encounter(
+    pokemon: Union[Pokemon, Sequence[Pokemon]],
+    ball_sequence: Union[str, Sequence[str]],
+    max_throws: int,
+    n_encounters: int = 1,
+    rng: Optional[np.random.Generator] = None,
+) -> Encounters:
+    """Samples whole encounters, throwing until capture or max_throws
+
+    Each encounter takes a single uniform draw that is inverted through the
+    throws-to-catch distribution: the head of `ball_sequence` by table lookup
+    and the repeated last ball as a geometric distribution.
+
+    Parameters
+    ----------
+    pokemon::[Pokemon | list[Pokemon]]
+        The pokemon being caught, a list simulates every pokemon at once
+    ball_sequence::[str | list[str]]
+        Pokeball types in throwing order, the last one is repeated
+    max_throws::int
+        Throws before the pokemon flees
+    n_encounters::int
+        Encounters to simulate for each pokemon
+    rng::[np.random.Generator]
+        Random generator, defaults to a fresh one
+
+    Returns
+    -------
+    encounters::Encounters
+        Balls thrown and capture outcome, shaped (n_pokemon, n_encounters)
+        or (n_encounters,) for a single pokemon
+    """
+    rng = rng or np.random.default_rng()
+    balls = _ball_list(ball_sequence, max_throws)
+    p = throw_probabilities(pokemon, balls)
+
+    head = len(balls) - 1
+    survival = np.cumprod(1 - p[..., :head], axis=-1)
+    survival_h = np.prod(1 - p[..., :head], axis=-1)[..., None]
+    p_last = p[..., -1][..., None]
+
+    u = rng.random(p.shape[:-1] + (n_encounters,))
+
+    # Caught during the head when u falls below the head cdf
+    in_head = np.sum(u[..., None] >= (1 - survival)[..., None, :], axis=-1) + 1
+
+    # Otherwise rescale u to the tail and invert the geometric cdf
+    with np.errstate(divide="ignore", invalid="ignore"):
+        v = 1 - (1 - u) / survival_h
+        tail = np.floor(np.log1p(-v) / np.log1p(-p_last)) + 1
+    tail = np.where(p_last > 0, np.maximum(tail, 1), np.inf)
+
+    throws = np.where(in_head <= head, in_head, head + tail)
+    caught = throws <= max_throws
+    throws = np.minimum(throws, max_throws).astype(np.int64)
+
+    return Encounters(throws=throws, caught=caught)
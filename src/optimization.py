@@ -0,0 +1,121 @@
+from typing import Dict, Iterable, List, Optional, Sequence, Union
+
+import numpy as np
+import pandas as pd
+
+from .ball_rules import STATUS_CODES, pokemon_attributes
+from .catching import _POKEBALL, ball_modifiers_batch, capture_rate
+from .pokemon import PokemonFactory, StatusEffect, current_hp_for, max_hp_for
+
+# Candidate hp percentages when no constraint is given: 1%, 2%, ..., 100%
+_DEFAULT_HP_PERCENTAGES = [round(i / 100, 2) for i in range(1, 101)]
+
+_COLUMNS = ["pokemon", "status", "hp_perc", "level", "pokeball", "capture_rate"]
+
+
+def best_combinations(
+    pokemon: Union[str, Sequence[str]],
+    levels: Iterable[int],
+    constraints: Optional[Dict[str, list]] = None,
+    by_level: bool = True,
+    factory: Optional[PokemonFactory] = None,
+) -> pd.DataFrame:
+    """Finds every (status, hp, pokeball) combination with the highest capture rate
+
+    The noiseless capture rate falls as current hp rises and rises with the
+    product catch_rate * ball_rate * status, so the maximum is always at the
+    lowest hp with the strongest (pokeball, status) pair. The argmax set is
+    then enumerated outwards from that corner, stopping each axis as soon as
+    the rate drops below the maximum, so the full grid is never evaluated.
+
+    Parameters
+    ----------
+    pokemon::[str | list[str]]
+        Pokemon name(s) to search
+    levels::[list[int]]
+        Levels to search
+    constraints::[dict]
+        Optional candidate lists under the config keys "statuses",
+        "hp_percentages" and "pokeballs". Missing keys allow every value
+    by_level::bool
+        If True the best combinations are reported for each level, otherwise
+        only the levels reaching each pokemon's overall best rate are kept
+    factory::[PokemonFactory]
+        Factory used to look up the pokemon, defaults to "pokemon.json"
+
+    Returns
+    -------
+    best::pd.DataFrame
+        One row per optimal combination, with the same columns as the sweep
+        results: pokemon, status, hp_perc, level, pokeball, capture_rate
+    """
+    if isinstance(pokemon, str):
+        pokemon = [pokemon]
+    constraints = constraints or {}
+    factory = factory or PokemonFactory("pokemon.json")
+
+    statuses = [StatusEffect[s] for s in constraints.get("statuses", StatusEffect.__members__)]
+    hp_percentages = list(constraints.get("hp_percentages", _DEFAULT_HP_PERCENTAGES))
+    pokeballs = [b.lower() for b in constraints.get("pokeballs", _POKEBALL.keys())]
+    levels = list(levels)
+
+    rows: List[dict] = []
+    for pkmn_name in pokemon:
+        base = factory.create(pkmn_name, levels[0], StatusEffect.NONE, 1.0)
+
+        pkmn_rows = []
+        for lvl in levels:
+            max_hp = max_hp_for(base.stats.hp, lvl)
+            curr_hps = current_hp_for(max_hp, hp_percentages)
+            # Lowest current hp first, stable so ties keep the config order
+            hp_order = np.argsort(curr_hps, kind="stable")
+
+            # Balls may depend on level and status, so rank (ball, status) pairs
+            # by the product catch_rate * ball_rate * status, strongest first
+            attributes = pokemon_attributes(
+                base, level=lvl, status=np.array([STATUS_CODES[s] for s in statuses])
+            )
+            pairs = []
+            for ball in pokeballs:
+                catch_rate, ball_rate = np.broadcast_arrays(
+                    *ball_modifiers_batch(attributes, ball), np.ones(len(statuses))
+                )[:2]
+                for i, status in enumerate(statuses):
+                    pairs.append((ball, status, catch_rate[i], ball_rate[i]))
+            pairs.sort(key=lambda p: p[2] * p[3] * p[1].value[1], reverse=True)
+
+            def rate(pair, hp_idx):
+                _, status, catch_rate, ball_rate = pair
+                return float(
+                    capture_rate(max_hp, curr_hps[hp_idx], catch_rate, ball_rate, status.value[1])
+                )
+
+            best_rate = rate(pairs[0], hp_order[0])
+
+            level_rows = []
+            for pair in pairs:
+                if rate(pair, hp_order[0]) < best_rate:
+                    break
+                for hp_idx in hp_order:
+                    if rate(pair, hp_idx) < best_rate:
+                        break
+                    level_rows.append({
+                        "pokemon": pkmn_name,
+                        "status": pair[1].name,
+                        "hp_perc": hp_percentages[hp_idx],
+                        "level": lvl,
+                        "pokeball": pair[0],
+                        "capture_rate": best_rate,
+                    })
+            pkmn_rows.append((best_rate, level_rows))
+
+        if by_level:
+            for _, level_rows in pkmn_rows:
+                rows.extend(level_rows)
+        else:
+            overall = max(best_rate for best_rate, _ in pkmn_rows)
+            for best_rate, level_rows in pkmn_rows:
+                if best_rate == overall:
+                    rows.extend(level_rows)
+
+    return pd.DataFrame(rows, columns=_COLUMNS)
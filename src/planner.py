@@ -0,0 +1,122 @@
+from itertools import product
+from typing import Dict, List, NamedTuple, Optional, Sequence
+
+import numpy as np
+
+from .catching import catch_probability_batch
+from .pokemon import Pokemon
+
+_OBJECTIVES = ("probability", "cost")
+# Values closer than this are treated as ties
+_TOLERANCE = 1e-12
+
+
+class ThrowPlan(NamedTuple):
+    sequence: List[str]  # Balls to throw in order while the pokemon is not caught
+    catch_probability: float
+    expected_cost: float
+
+
+def _better(objective, p_new, c_new, p_old, c_old):
+    """Where the new option beats the old one, ties broken by the other metric"""
+    if objective == "probability":
+        primary, secondary = p_new - p_old, c_old - c_new
+    else:
+        primary, secondary = c_old - c_new, p_new - p_old
+    tie = np.abs(primary) <= _TOLERANCE
+    return (primary > _TOLERANCE) | (tie & (secondary > _TOLERANCE))
+
+
+def plan_throws_batch(
+    pokemon: Sequence[Pokemon],
+    inventory: Dict[str, int],
+    costs: Optional[Dict[str, float]] = None,
+    budget: Optional[float] = None,
+    objective: str = "probability",
+) -> List[ThrowPlan]:
+    """Optimal throwing order for many pokemon sharing an inventory
+
+    Dynamic programming over inventory states: the value of a state (balls
+    left) only depends on the states with one ball less, so states are solved
+    by increasing number of balls and each one is stored once. Every state
+    holds the value for all pokemon at once.
+
+    Parameters
+    ----------
+    pokemon::[list[Pokemon]]
+        The pokemon to plan for
+    inventory::[dict[str, int]]
+        Number of balls of each pokeball type
+    costs::[dict[str, float]]
+        Cost of each pokeball type, defaults to 1 so costs count balls
+    budget::[float]
+        Maximum total cost that may be spent, defaults to no limit
+    objective::str
+        "probability" maximizes the catch probability (ties by lower expected
+        cost). "cost" throws until caught or out of affordable balls and
+        minimizes the expected cost (ties by higher catch probability)
+
+    Returns
+    -------
+    plans::list[ThrowPlan]
+        One plan per pokemon
+    """
+    if objective not in _OBJECTIVES:
+        raise ValueError(f"objective has to be one of {_OBJECTIVES}")
+    balls = [ball.lower() for ball in inventory]
+    counts = tuple(inventory.values())
+    costs = {k.lower(): v for k, v in (costs or {}).items()}
+    cost = np.array([costs.get(ball, 1) for ball in balls], dtype=np.float64)
+    budget = np.inf if budget is None else budget
+
+    # (n_pokemon, n_balls) capture probability of a single throw
+    p = catch_probability_batch(pokemon, balls)
+
+    # state -> (catch probability, expected cost, chosen ball or -1 to stop)
+    values = {}
+    states = sorted(product(*(range(n + 1) for n in counts)), key=sum)
+    for state in states:
+        spent = float(np.dot(np.subtract(counts, state), cost))
+        best_p = np.zeros(len(pokemon))
+        best_c = np.zeros(len(pokemon))
+        choice = np.full(len(pokemon), -1)
+
+        for b in range(len(balls)):
+            if state[b] == 0 or spent + cost[b] > budget + _TOLERANCE:
+                continue
+            next_p, next_c, _ = values[state[:b] + (state[b] - 1,) + state[b + 1 :]]
+            option_p = p[:, b] + (1 - p[:, b]) * next_p
+            option_c = cost[b] + (1 - p[:, b]) * next_c
+
+            # The cost objective never stops while a ball can be thrown
+            better = _better(objective, option_p, option_c, best_p, best_c)
+            if objective == "cost":
+                better |= choice == -1
+            best_p = np.where(better, option_p, best_p)
+            best_c = np.where(better, option_c, best_c)
+            choice = np.where(better, b, choice)
+
+        values[state] = (best_p, best_c, choice)
+
+    plans = []
+    for i in range(len(pokemon)):
+        state, sequence = counts, []
+        while values[state][2][i] != -1:
+            b = values[state][2][i]
+            sequence.append(balls[b])
+            state = state[:b] + (state[b] - 1,) + state[b + 1 :]
+        plans.append(
+            ThrowPlan(sequence, float(values[counts][0][i]), float(values[counts][1][i]))
+        )
+    return plans
+
+
+def plan_throws(
+    pokemon: Pokemon,
+    inventory: Dict[str, int],
+    costs: Optional[Dict[str, float]] = None,
+    budget: Optional[float] = None,
+    objective: str = "probability",
+) -> ThrowPlan:
+    """Optimal throwing order for a single pokemon, see plan_throws_batch"""
+    return plan_throws_batch([pokemon], inventory, costs, budget, objective)[0]
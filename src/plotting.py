@@ -0,0 +1,78 @@
+from typing import Optional
+
+import numpy as np
+import plotly.graph_objects as go
+
+# Traces with more points than this are drawn with WebGL
+WEBGL_THRESHOLD = 1000
+# Longer curves are downsampled with LTTB before building the figure
+MAX_POINTS = 2000
+
+
+def lttb(x, y, n_out: int) -> np.ndarray:
+    """Largest-Triangle-Three-Buckets downsampling of a curve
+
+    Keeps the first and last points and, for each of the n_out - 2 buckets in
+    between, the point forming the largest triangle with the previously kept
+    point and the mean of the next bucket.
+
+    Returns
+    -------
+    indices::np.ndarray
+        Sorted indices of the kept points
+    """
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    n = x.size
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+
+    edges = np.linspace(1, n - 1, n_out - 1).astype(np.int64)
+    kept = np.empty(n_out, dtype=np.int64)
+    kept[0], kept[-1] = 0, n - 1
+
+    a = 0
+    for i in range(n_out - 2):
+        start, stop = edges[i], edges[i + 1]
+        next_stop = edges[i + 2] if i + 2 < len(edges) else n
+        avg_x = x[stop:next_stop].mean()
+        avg_y = y[stop:next_stop].mean()
+
+        areas = np.abs(
+            (x[a] - avg_x) * (y[start:stop] - y[a])
+            - (x[a] - x[start:stop]) * (avg_y - y[a])
+        )
+        a = start + int(np.argmax(areas))
+        kept[i + 1] = a
+
+    return kept
+
+
+def _scatter_class(n_points: int):
+    return go.Scattergl if n_points > WEBGL_THRESHOLD else go.Scatter
+
+
+def line_trace(x, y, max_points: Optional[int] = MAX_POINTS, **kwargs):
+    """Scatter trace of a curve, downsampled with LTTB and drawn with WebGL when large"""
+    x, y = np.asarray(x), np.asarray(y)
+    if max_points is not None and x.size > max_points:
+        kept = lttb(x, y, max_points)
+        x, y = x[kept], y[kept]
+    return _scatter_class(x.size)(x=x, y=y, **kwargs)
+
+
+def band_trace(x, low, high, max_points: Optional[int] = MAX_POINTS, **kwargs):
+    """Single trace drawing both bounds of a band
+
+    The upper and lower curves are joined with a NaN gap, so a band costs one
+    trace instead of two.
+    """
+    x, low, high = np.asarray(x), np.asarray(low), np.asarray(high)
+    if max_points is not None and x.size > max_points:
+        # Keep the points that shape either bound
+        kept = np.union1d(lttb(x, low, max_points // 2), lttb(x, high, max_points // 2))
+        x, low, high = x[kept], low[kept], high[kept]
+    gap = [np.nan]
+    return _scatter_class(2 * x.size)(
+        x=np.concatenate([x, gap, x]), y=np.concatenate([high, gap, low]), **kwargs
+    )
@@ -1,5 +1,6 @@
 from abc import ABC
 
+from .ball_rules import CompiledBall
 from .pokemon import Pokemon
 
 
@@ -75,3 +76,16 @@ class HeavyBall(BasePokeball):
         catch_rate = self._catching_pkmn.catch_rate + modifier
 
         return catch_rate if catch_rate > 0 else 1
+
+
+class RuleBall(BasePokeball):
+    # Pokeball defined in a data file, see ball_rules.py
+    def __init__(self, catching_pkmn: Pokemon, definition: CompiledBall):
+        super().__init__(catching_pkmn)
+        self._definition = definition
+        self._name = definition.name
+        self._catch_rate, self._ball_rate = definition.evaluate_pokemon(catching_pkmn)
+
+    @property
+    def catch_rate(self):
+        return self._catch_rate
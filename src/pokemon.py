@@ -3,6 +3,8 @@ import math
 from enum import Enum
 from typing import NamedTuple, Tuple
 
+import numpy as np
+
 
 class Type(str, Enum):
     NORMAL = "normal"
@@ -44,6 +46,18 @@ class StatusEffect(Enum):
     NONE = ("none", 1)
 
 
+def max_hp_for(base_hp, level):
+    """Vectorized max hp formula, accepts scalars or numpy arrays"""
+    # Real max hp formula includes EVs and IVs, this is a simplification
+    return np.floor(0.01 * (2 * np.asarray(base_hp)) + level + 10)
+
+
+def current_hp_for(max_hp, hp_percentage):
+    """Vectorized current hp as computed by PokemonFactory.create"""
+    hp = np.floor(np.asarray(hp_percentage) * max_hp)
+    return np.where(hp > 0, hp, 1)
+
+
 class Pokemon:
     def __init__(
         self,
@@ -92,7 +106,7 @@ class Pokemon:
         base_hp = self._stats.hp
         level = self.level
 
-        # Real max hp formula includes EVs and IVs, this is a simplification
+        # Same as max_hp_for, in plain Python for the per-pokemon path
         return math.floor(0.01 * (2 * base_hp) + level + 10)
 
 
@@ -0,0 +1,313 @@
+import json
+from typing import Dict, Iterator, List, NamedTuple, Optional, Sequence, Tuple
+
+import numpy as np
+
+from .ball_rules import STATUS_CODES, pokemon_attributes
+from .catching import COMPILED_POKEBALLS, attempt_catch_batch
+from .pokemon import PokemonFactory, StatusEffect, current_hp_for, max_hp_for
+from .trace import ThrowTracer
+
+
+class SpawnEntry(NamedTuple):
+    pokemon: str
+    weight: float
+    levels: Tuple[int, int]  # Inclusive level range, drawn uniformly
+    hp: Tuple[float, float] = (1.0, 1.0)  # hp percentage range, drawn uniformly
+
+
+class PopulationStats(NamedTuple):
+    pokemon: List[str]
+    encounters: np.ndarray  # Encounters of each species
+    catches: np.ndarray  # Successful catches of each species
+    capture_rate_sum: np.ndarray  # Sum of capture rates, for the mean rate
+
+    @property
+    def success_rate(self) -> np.ndarray:
+        with np.errstate(divide="ignore", invalid="ignore"):
+            return self.catches / self.encounters
+
+    @property
+    def mean_capture_rate(self) -> np.ndarray:
+        with np.errstate(divide="ignore", invalid="ignore"):
+            return self.capture_rate_sum / self.encounters
+
+    def merge(self, other: "PopulationStats") -> "PopulationStats":
+        """Combines the statistics of two runs over the same spawn table"""
+        return PopulationStats(
+            self.pokemon,
+            self.encounters + other.encounters,
+            self.catches + other.catches,
+            self.capture_rate_sum + other.capture_rate_sum,
+        )
+
+
+class AliasTable:
+    """Walker's alias method, O(1) sampling from a discrete distribution
+
+    Built with Vose's algorithm: every bucket holds its own index with
+    probability `prob[i]` and its alias otherwise.
+    """
+
+    def __init__(self, weights: Sequence[float]):
+        weights = np.asarray(weights, dtype=np.float64)
+        if weights.ndim != 1 or weights.size == 0:
+            raise ValueError("weights has to be a non empty 1d sequence")
+        if np.any(weights < 0) or weights.sum() <= 0:
+            raise ValueError("weights have to be non negative with a positive sum")
+
+        n = weights.size
+        scaled = weights * n / weights.sum()
+        self._prob = np.ones(n)
+        self._alias = np.arange(n)
+
+        small = [i for i in range(n) if scaled[i] < 1]
+        large = [i for i in range(n) if scaled[i] >= 1]
+        while small and large:
+            s, l = small.pop(), large.pop()
+            self._prob[s] = scaled[s]
+            self._alias[s] = l
+            scaled[l] -= 1 - scaled[s]
+            (small if scaled[l] < 1 else large).append(l)
+        # Leftovers are 1 up to rounding error
+
+    def __len__(self):
+        return self._prob.size
+
+    def sample(self, size: int, rng: np.random.Generator) -> np.ndarray:
+        # One uniform picks the bucket with its integer part and decides
+        # between the bucket and its alias with the fractional part
+        scaled = rng.random(size) * self._prob.size
+        bucket = scaled.astype(np.int64)
+        keep = scaled - bucket < self._prob[bucket]
+        return np.where(keep, bucket, self._alias[bucket])
+
+
+def load_spawn_table(path: str) -> Tuple[List[SpawnEntry], Dict[str, float]]:
+    """Reads spawn entries and status weights from a population config
+
+    The config looks like {"spawns": [{"pokemon": ..., "weight": ...,
+    "levels": [min, max], "hp": [min, max]}, ...], "statuses": {"NONE": w, ...}}
+    """
+    with open(path, "r") as f:
+        config = json.load(f)
+
+    spawns = [
+        SpawnEntry(
+            s["pokemon"], s["weight"], tuple(s["levels"]), tuple(s.get("hp", (1.0, 1.0)))
+        )
+        for s in config["spawns"]
+    ]
+    return spawns, config.get("statuses", {StatusEffect.NONE.name: 1})
+
+
+class _EncounterSampler:
+    """Draws the formula inputs of wild encounters
+
+    Built from JSON serializable parameters, so a traced chunk can be drawn
+    again from its generator state, see redraw_encounters.
+    """
+
+    def __init__(
+        self,
+        spawns: Sequence[SpawnEntry],
+        pokeball: str,
+        status_weights: Dict[str, float],
+        species_attributes: Dict[str, np.ndarray],
+        dtype=np.float64,
+    ):
+        if pokeball.lower() not in COMPILED_POKEBALLS:
+            raise ValueError("Invalid pokeball type")
+        self.ball = COMPILED_POKEBALLS[pokeball.lower()]
+        self.spawns = [SpawnEntry(*s) for s in spawns]
+        self.status_weights = dict(status_weights)
+        self.species_attributes = {k: np.asarray(v) for k, v in species_attributes.items()}
+        self.dtype = np.dtype(dtype)
+
+        self.level_lo, level_hi = np.array([s.levels for s in self.spawns]).T
+        self.level_span = (level_hi - self.level_lo + 1).astype(np.float64)
+        self.hp_lo, self.hp_hi = np.array([s.hp for s in self.spawns], dtype=dtype).T
+        self.species_hp = self.species_attributes["hp"]
+
+        # Balls that don't read the drawn level or status are evaluated once per
+        # species, otherwise only the attributes the ball reads are gathered
+        self.per_encounter = self.ball.attributes & {"level", "status"}
+        if not self.per_encounter:
+            self.species_modifiers = [
+                np.broadcast_to(m, len(self.spawns))
+                for m in self.ball.evaluate(self.species_attributes)
+            ]
+        self.gathered = sorted(self.ball.attributes - self.per_encounter)
+
+        # Species and status are independent, one table over (species, status)
+        # pairs draws both with a single sample
+        self.encounters = AliasTable(
+            np.outer([s.weight for s in self.spawns], list(self.status_weights.values())).ravel()
+        )
+        status_effects = [StatusEffect[s] for s in self.status_weights]
+        self.multipliers = np.array([s.value[1] for s in status_effects], dtype=dtype)
+        self.status_codes = np.array([STATUS_CODES[s] for s in status_effects])
+
+    @property
+    def params(self) -> dict:
+        """JSON serializable arguments of the sampler"""
+        return {
+            "spawns": [list(s) for s in self.spawns],
+            "pokeball": self.ball.key,
+            "status_weights": self.status_weights,
+            "species_attributes": {k: v.tolist() for k, v in self.species_attributes.items()},
+            "dtype": self.dtype.name,
+        }
+
+    def draw(self, size: int, rng: np.random.Generator) -> Tuple[np.ndarray, tuple]:
+        """Species index and (max_hp, curr_hp, catch_rate, ball_rate, status) of encounters"""
+        idx, status = np.divmod(self.encounters.sample(size, rng), len(self.status_weights))
+        level = self.level_lo[idx] + (rng.random(size) * self.level_span[idx]).astype(np.int64)
+        hp = self.hp_lo[idx] + (self.hp_hi[idx] - self.hp_lo[idx]) * rng.random(
+            size, dtype=self.dtype
+        )
+
+        if self.per_encounter:
+            attributes = {k: self.species_attributes[k][idx] for k in self.gathered}
+            attributes.update(level=level, status=self.status_codes[status])
+            catch_rate, ball_rate = self.ball.evaluate(attributes)
+        else:
+            catch_rate, ball_rate = (m[idx] for m in self.species_modifiers)
+
+        max_hp = max_hp_for(self.species_hp[idx], level)
+        curr_hp = current_hp_for(max_hp, hp)
+        return idx, (max_hp, curr_hp, catch_rate, ball_rate, self.multipliers[status])
+
+
+def redraw_encounters(params: dict, size: int, rng: np.random.Generator) -> Tuple[np.ndarray, tuple]:
+    """Draws a traced chunk of encounters again, see _EncounterSampler.draw
+
+    `params` are the ones recorded with the chunk and `rng` is restored to
+    the generator state the chunk started from.
+    """
+    sampler = _EncounterSampler(
+        params["spawns"],
+        params["pokeball"],
+        params["status_weights"],
+        params["species_attributes"],
+        params["dtype"],
+    )
+    return sampler.draw(size, rng)
+
+
+def iter_population(
+    spawns: Sequence[SpawnEntry],
+    pokeball: str,
+    n_encounters: int,
+    status_weights: Optional[Dict[str, float]] = None,
+    noise: float = 0.0,
+    chunk_size: int = 1 << 20,
+    rng: Optional[np.random.Generator] = None,
+    factory: Optional[PokemonFactory] = None,
+    tracer: Optional[ThrowTracer] = None,
+    dtype=np.float64,
+) -> Iterator[PopulationStats]:
+    """Simulates wild encounters in chunks, yielding the statistics of each chunk
+
+    Species and status are drawn by weight with one alias table, then levels
+    and hp are drawn for the whole chunk at once and every throw is
+    evaluated with attempt_catch_batch. Memory only depends on chunk_size.
+
+    Parameters
+    ----------
+    spawns::[list[SpawnEntry]]
+        Species of the area with their spawn weight, level and hp ranges
+    pokeball::str
+        The type of pokeball thrown at every encounter
+    n_encounters::int
+        Total encounters to simulate
+    status_weights::[dict[str, float]]
+        Relative weight of each StatusEffect name, defaults to NONE only
+    noise::float
+        Standard deviation of the multiplicative noise
+    chunk_size::int
+        Encounters simulated per chunk
+    rng::[np.random.Generator]
+        Random generator, defaults to a fresh one
+    factory::[PokemonFactory]
+        Factory used to look up the pokemon, defaults to "pokemon.json"
+    tracer::[ThrowTracer]
+        Records the generator state and the sampler parameters of every
+        chunk, enough to draw its encounters and throws again. Throws are
+        tagged with the index of their spawn entry
+    dtype::[np.dtype]
+        Floating point type of the hp draws and the throws, see
+        attempt_catch_batch
+
+    Yields
+    ------
+    stats::PopulationStats
+        Per species statistics of one chunk
+    """
+    rng = rng or np.random.default_rng()
+    factory = factory or PokemonFactory("pokemon.json")
+    status_weights = status_weights or {StatusEffect.NONE.name: 1}
+
+    # Species attributes as arrays, indexed by the sampled species
+    names = [s.pokemon for s in spawns]
+    per_species = [
+        pokemon_attributes(factory.create(s.pokemon, s.levels[0], StatusEffect.NONE, 1.0))
+        for s in spawns
+    ]
+    species_attributes = {
+        k: np.array([a[k] for a in per_species]) for k in per_species[0]
+    }
+    sampler = _EncounterSampler(spawns, pokeball, status_weights, species_attributes, dtype)
+    params = sampler.params if tracer is not None else None
+
+    remaining = n_encounters
+    while remaining > 0:
+        size = min(chunk_size, remaining)
+        remaining -= size
+
+        state = rng.bit_generator.state if tracer is not None else None
+        idx, inputs = sampler.draw(size, rng)
+        success, rate = attempt_catch_batch(*inputs, noise, rng, dtype=dtype)
+
+        stats = PopulationStats(
+            names,
+            np.bincount(idx, minlength=len(names)),
+            np.bincount(idx, weights=success, minlength=len(names)).astype(np.int64),
+            np.bincount(idx, weights=rate, minlength=len(names)),
+        )
+        if tracer is not None:
+            tracer.record_source("population", params, state, size, noise, dtype, stats.catches)
+        yield stats
+
+
+def simulate_population(
+    spawns: Sequence[SpawnEntry],
+    pokeball: str,
+    n_encounters: int,
+    status_weights: Optional[Dict[str, float]] = None,
+    noise: float = 0.0,
+    chunk_size: int = 1 << 20,
+    rng: Optional[np.random.Generator] = None,
+    factory: Optional[PokemonFactory] = None,
+    tracer: Optional[ThrowTracer] = None,
+    dtype=np.float64,
+) -> PopulationStats:
+    """Aggregated statistics of a whole population run, see iter_population"""
+    n = len(spawns)
+    total = PopulationStats(
+        [s.pokemon for s in spawns], np.zeros(n, np.int64), np.zeros(n, np.int64), np.zeros(n)
+    )
+    for stats in iter_population(
+        spawns,
+        pokeball,
+        n_encounters,
+        status_weights,
+        noise,
+        chunk_size,
+        rng,
+        factory,
+        tracer,
+        dtype,
+    ):
+        total = total.merge(stats)
+    return total
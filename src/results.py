@@ -0,0 +1,55 @@
+from typing import Dict, Sequence
+
+import numpy as np
+import pandas as pd
+
+
+def _axis_column(labels: Sequence, codes: np.ndarray):
+    """Builds the column for one grid axis from its per-row positions
+
+    Non negative integer labels (levels) are stored in the narrowest unsigned
+    dtype, everything else (names, statuses, hp percentages) as a categorical
+    with sorted categories so groupby/pivot order matches plain columns.
+    """
+    labels = np.asarray(labels)
+    if labels.dtype.kind in "iu" and (labels.size == 0 or labels.min() >= 0):
+        dtype = np.min_scalar_type(labels.max() if labels.size else 0)
+        return labels.astype(dtype)[codes]
+
+    categories, inverse = np.unique(labels, return_inverse=True)
+    return pd.Categorical.from_codes(inverse[codes], categories)
+
+
+def grid_frame(axes: Dict[str, Sequence], **values: np.ndarray) -> pd.DataFrame:
+    """Flattens dense result arrays over a grid into a compact long DataFrame
+
+    Parameters
+    ----------
+    axes::[dict[str, list]]
+        Ordered mapping of column name to the labels of each grid axis
+    values::[np.ndarray]
+        Result arrays whose shape is the length of each axis, in order
+
+    Returns
+    -------
+    df::pd.DataFrame
+        One row per grid cell in C order, axis columns first then values as
+        float32, the same rows a nested loop over the axes would produce
+    """
+    shape = tuple(len(labels) for labels in axes.values())
+    code_dtype = np.min_scalar_type(max(shape, default=1))
+
+    columns = {}
+    for i, (name, labels) in enumerate(axes.items()):
+        positions = np.arange(shape[i], dtype=code_dtype)
+        positions = positions.reshape((-1,) + (1,) * (len(shape) - i - 1))
+        codes = np.broadcast_to(positions, shape).ravel()
+        columns[name] = _axis_column(labels, codes)
+
+    for name, array in values.items():
+        array = np.asarray(array, dtype=np.float32)
+        if array.shape != shape:
+            raise ValueError(f"{name} has shape {array.shape}, expected {shape}")
+        columns[name] = array.ravel()
+
+    return pd.DataFrame(columns)
@@ -0,0 +1,133 @@
+from typing import Dict, NamedTuple, Optional
+
+import numpy as np
+
+from .ball_rules import STATUS_CODES, pokemon_attributes
+from .catching import ball_modifiers_batch
+from .cube import ResultCube
+from .pokemon import PokemonFactory, StatusEffect, current_hp_for, max_hp_for
+
+# Factors of the capture probability, in the order of the sweep axes
+FACTORS = ("status", "hp_perc", "level", "ball")
+
+
+class Sensitivity(NamedTuple):
+    probability: np.ndarray  # Noiseless capture probability
+    partials: Dict[str, np.ndarray]  # d probability / d factor
+    elasticities: Dict[str, np.ndarray]  # % change of probability per % of factor
+
+
+class SensitivityReport(NamedTuple):
+    probability: ResultCube
+    partials: Dict[str, ResultCube]
+    elasticities: Dict[str, ResultCube]
+
+
+def capture_sensitivity(
+    max_hp, hp_perc, level, catch_rate, ball_rate, status
+) -> Sensitivity:
+    """Partial derivatives and elasticities of the capture probability
+
+    Taking the current hp as H = h * M the formula of capture_rate is
+
+        p = 1 / (768 M) + k (3 - 2h) / 768,  k = catch_rate * ball_rate * status
+
+    and M = 0.02 * base_hp + level + 10, so dM / dlevel = 1. The probability
+    uses the floored current hp like the game, the derivatives relax the
+    floors and the 4 decimal rounding. Where the probability is capped at 1
+    every derivative is 0.
+
+    Parameters
+    ----------
+    max_hp, hp_perc, level::[np.ndarray]
+        Max hp, hp percentage and level of each operating point
+    catch_rate, ball_rate::[np.ndarray]
+        Catch rate as modified by the pokeball and the pokeball's own rate
+    status::[np.ndarray]
+        Status effect multiplier
+
+    Returns
+    -------
+    sensitivity::Sensitivity
+        Broadcast arrays of the probability and of each factor in FACTORS.
+        "ball" is the ball rate, or any other multiplier of catch_rate * ball_rate
+    """
+    max_hp, hp_perc, level, catch_rate, ball_rate, status = (
+        np.asarray(x, dtype=np.float64)
+        for x in (max_hp, hp_perc, level, catch_rate, ball_rate, status)
+    )
+    k = catch_rate * ball_rate * status
+    curr_hp = current_hp_for(max_hp, hp_perc)
+    probability = (1 + (3 * max_hp - 2 * curr_hp) * k) / (768 * max_hp)
+    free = probability < 1
+
+    partials = {
+        "status": catch_rate * ball_rate * (3 - 2 * hp_perc) / 768,
+        "hp_perc": -k / 384,
+        "level": -1 / (768 * max_hp**2),
+        "ball": catch_rate * status * (3 - 2 * hp_perc) / 768,
+    }
+    values = {"status": status, "hp_perc": hp_perc, "level": level, "ball": ball_rate}
+    partials = {f: np.where(free, d, 0.0) for f, d in partials.items()}
+    probability = np.minimum(probability, 1)
+    elasticities = {f: d * values[f] / probability for f, d in partials.items()}
+
+    return Sensitivity(probability, partials, elasticities)
+
+
+def sensitivity_report(
+    axes: Dict[str, list], factory: Optional[PokemonFactory] = None
+) -> SensitivityReport:
+    """Analytic sensitivity of every cell of a sweep grid, see capture_sensitivity
+
+    Evaluates the closed form for all species and operating points at once,
+    so it answers which factor matters most without simulating.
+
+    Parameters
+    ----------
+    axes::[dict[str, list]]
+        Grid to evaluate, see sweep.sweep_axes
+    factory::[PokemonFactory]
+        Factory used to look up the pokemon, defaults to "pokemon.json"
+
+    Returns
+    -------
+    report::SensitivityReport
+        Cubes with the axes of the grid, one per factor for partials and
+        elasticities
+    """
+    factory = factory or PokemonFactory("pokemon.json")
+    statuses = [StatusEffect[s] for s in axes["status"]]
+
+    # Broadcast shape: (pokemon, status, hp, level, pokeball)
+    status = np.array([s.value[1] for s in statuses])[None, :, None, None, None]
+    status_code = np.array([STATUS_CODES[s] for s in statuses])[:, None]
+    hp_perc = np.asarray(axes["hp_perc"], dtype=np.float64)[None, None, :, None, None]
+    levels = np.asarray(axes["level"])
+    shape = tuple(len(v) for v in axes.values())
+
+    catch_rate, ball_rate = np.empty((2, shape[0], shape[1], 1, shape[3], shape[4]))
+    base_hp = np.empty(shape[0])
+    for i, pkmn_name in enumerate(axes["pokemon"]):
+        base = factory.create(pkmn_name, int(levels[0]), StatusEffect.NONE, 1.0)
+        base_hp[i] = base.stats.hp
+        # (status, level) attributes, balls may depend on both
+        attributes = pokemon_attributes(base, level=levels[None, :], status=status_code)
+        for j, ball in enumerate(axes["pokeball"]):
+            modifiers = ball_modifiers_batch(attributes, ball)
+            catch_rate[i, :, 0, :, j], ball_rate[i, :, 0, :, j] = (
+                np.broadcast_to(m, (shape[1], shape[3])) for m in modifiers
+            )
+
+    level = levels[None, None, None, :, None]
+    max_hp = max_hp_for(base_hp[:, None, None, None, None], level)
+    result = capture_sensitivity(max_hp, hp_perc, level, catch_rate, ball_rate, status)
+
+    def cube(values):
+        return ResultCube(axes, np.broadcast_to(values, shape).astype(np.float32))
+
+    return SensitivityReport(
+        cube(result.probability),
+        {f: cube(d) for f, d in result.partials.items()},
+        {f: cube(e) for f, e in result.elasticities.items()},
+    )
@@ -0,0 +1,235 @@
+from statistics import NormalDist
+from typing import NamedTuple, Optional, Sequence, Tuple
+
+import numpy as np
+
+# Upper bound of bootstrap replicates held in memory at once
+_MAX_BATCH = 1 << 24
+
+
+class OnlineStats(NamedTuple):
+    """Mergeable running statistics of throws, one entry per cell
+
+    Tracks the throws, the successes and the mean and M2 (sum of squared
+    deviations) of the capture rate with Welford's method, so memory doesn't
+    grow with the number of throws. Accumulators of disjoint throws, e.g.
+    parallel shards or the cells of a bin, combine exactly with merge.
+    """
+
+    count: np.ndarray
+    successes: np.ndarray
+    mean: np.ndarray  # Mean capture rate
+    m2: np.ndarray  # Sum of squared deviations from the mean capture rate
+
+    @classmethod
+    def zeros(cls, shape=()) -> "OnlineStats":
+        counts = np.zeros(shape, np.int64)
+        return cls(counts, counts.copy(), np.zeros(shape), np.zeros(shape))
+
+    @classmethod
+    def stack(cls, stats: Sequence["OnlineStats"]) -> "OnlineStats":
+        """Joins accumulators into one with a new leading axis of cells"""
+        return cls(*(np.stack(field) for field in zip(*stats)))
+
+    def add(self, success, rate) -> "OnlineStats":
+        """Adds one throw to every cell, Welford's update"""
+        count = self.count + 1
+        delta = rate - self.mean
+        mean = self.mean + delta / count
+        successes = self.successes + np.asarray(success, np.int64)
+        return OnlineStats(count, successes, mean, self.m2 + delta * (rate - mean))
+
+    def merge(self, other: "OnlineStats") -> "OnlineStats":
+        """Combines the statistics of disjoint throws of the same cells (Chan et al.)"""
+        count = self.count + other.count
+        safe = np.maximum(count, 1)
+        delta = other.mean - self.mean
+        return OnlineStats(
+            count,
+            self.successes + other.successes,
+            self.mean + delta * other.count / safe,
+            self.m2 + other.m2 + delta**2 * self.count * other.count / safe,
+        )
+
+    def group(self, keys) -> Tuple[np.ndarray, "OnlineStats"]:
+        """Merges the cells sharing a key, e.g. the hp values of a bin
+
+        Returns the sorted distinct keys and one merged cell per key.
+        """
+        labels, inverse = np.unique(np.asarray(keys).ravel(), return_inverse=True)
+        inverse = inverse.ravel()
+        count, mean = self.count.ravel(), self.mean.ravel()
+
+        def total(weights):
+            return np.bincount(inverse, weights=weights, minlength=labels.size)
+
+        group_count = total(count)
+        group_mean = total(count * mean) / np.maximum(group_count, 1)
+        # Within cell deviations plus the deviation of each cell mean from the group mean
+        m2 = self.m2.ravel() + count * (mean - group_mean[inverse]) ** 2
+
+        return labels, OnlineStats(
+            group_count.astype(np.int64),
+            total(self.successes.ravel()).astype(np.int64),
+            group_mean,
+            total(m2),
+        )
+
+    @property
+    def success_rate(self) -> np.ndarray:
+        with np.errstate(divide="ignore", invalid="ignore"):
+            return self.successes / self.count
+
+    @property
+    def variance(self) -> np.ndarray:
+        """Population variance of the capture rate, like np.var"""
+        with np.errstate(divide="ignore", invalid="ignore"):
+            return self.m2 / self.count
+
+    @property
+    def std(self) -> np.ndarray:
+        return np.sqrt(self.variance)
+
+
+def _tail(confidence: float) -> float:
+    """Probability left out on each side of a two sided interval"""
+    if not 0 < confidence < 1:
+        raise ValueError("confidence has to be between 0 and 1")
+    return (1 - confidence) / 2
+
+
+def wilson_interval(
+    successes, trials, confidence: float = 0.95
+) -> Tuple[np.ndarray, np.ndarray]:
+    """Wilson score interval of a success rate, for every cell at once
+
+    Parameters
+    ----------
+    successes, trials::[np.ndarray]
+        Broadcastable arrays of successes and trials of each cell
+    confidence::float
+        Confidence level of the interval
+
+    Returns
+    -------
+    low, high::np.ndarray
+        Interval bounds, NaN where a cell has no trials
+    """
+    successes = np.asarray(successes, dtype=np.float64)
+    trials = np.asarray(trials, dtype=np.float64)
+    z = NormalDist().inv_cdf(1 - _tail(confidence))
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        p = successes / trials
+        denominator = 1 + z**2 / trials
+        center = (p + z**2 / (2 * trials)) / denominator
+        half = z * np.sqrt(p * (1 - p) / trials + z**2 / (4 * trials**2)) / denominator
+
+    return np.clip(center - half, 0, 1), np.clip(center + half, 0, 1)
+
+
+def bootstrap_interval(
+    successes,
+    trials,
+    confidence: float = 0.95,
+    n_resamples: int = 1000,
+    rng: Optional[np.random.Generator] = None,
+) -> Tuple[np.ndarray, np.ndarray]:
+    """Percentile bootstrap interval of a success rate, for every cell at once
+
+    Resampling the trials of a cell with replacement is a binomial draw with
+    the observed rate, so all cells and replicates are drawn in one call.
+
+    Parameters
+    ----------
+    successes, trials::[np.ndarray]
+        Broadcastable arrays of successes and trials of each cell
+    confidence::float
+        Confidence level of the interval
+    n_resamples::int
+        Bootstrap replicates per cell
+    rng::[np.random.Generator]
+        Random generator, defaults to a fresh one
+
+    Returns
+    -------
+    low, high::np.ndarray
+        Interval bounds, NaN where a cell has no trials
+    """
+    rng = rng or np.random.default_rng()
+    successes, trials = np.broadcast_arrays(
+        np.asarray(successes, dtype=np.int64), np.asarray(trials, dtype=np.int64)
+    )
+    alpha = _tail(confidence)
+
+    flat_successes = successes.ravel()
+    flat_trials = trials.ravel()
+    low = np.full(flat_trials.shape, np.nan)
+    high = np.full(flat_trials.shape, np.nan)
+
+    cells = max(1, _MAX_BATCH // n_resamples)
+    for start in range(0, flat_trials.size, cells):
+        n = flat_trials[start : start + cells, None]
+        valid = n[:, 0] > 0
+        n_safe = np.maximum(n, 1)
+        p = np.where(n > 0, flat_successes[start : start + cells, None] / n_safe, 0)
+        replicates = rng.binomial(n, p, size=(n.shape[0], n_resamples)) / n_safe
+        bounds = np.quantile(replicates, [alpha, 1 - alpha], axis=-1)
+        low[start : start + cells] = np.where(valid, bounds[0], np.nan)
+        high[start : start + cells] = np.where(valid, bounds[1], np.nan)
+
+    return low.reshape(trials.shape), high.reshape(trials.shape)
+
+
+def bootstrap_mean_interval(
+    samples,
+    confidence: float = 0.95,
+    n_resamples: int = 1000,
+    rng: Optional[np.random.Generator] = None,
+) -> Tuple[np.ndarray, np.ndarray]:
+    """Percentile bootstrap interval of the mean of per trial values
+
+    Every replicate reweights the trials with multinomial counts shared by
+    the cells of a chunk, so replicate means are matrix products instead of
+    a resampling loop per cell. Counts and replicates are built in chunks of
+    resamples and cells bounded like bootstrap_interval.
+
+    Parameters
+    ----------
+    samples::[np.ndarray]
+        Per trial values, trials along the last axis
+    confidence::float
+        Confidence level of the interval
+    n_resamples::int
+        Bootstrap replicates
+    rng::[np.random.Generator]
+        Random generator, defaults to a fresh one
+
+    Returns
+    -------
+    low, high::np.ndarray
+        Interval bounds with the shape of samples without its last axis
+    """
+    rng = rng or np.random.default_rng()
+    samples = np.asarray(samples, dtype=np.float64)
+    alpha = _tail(confidence)
+
+    n = samples.shape[-1]
+    flat_samples = samples.reshape(-1, n)
+    low = np.empty(flat_samples.shape[0])
+    high = np.empty(flat_samples.shape[0])
+
+    cells = max(1, _MAX_BATCH // n_resamples)
+    resamples = max(1, _MAX_BATCH // n)
+    for start in range(0, flat_samples.shape[0], cells):
+        chunk = flat_samples[start : start + cells]
+        replicates = np.empty((chunk.shape[0], n_resamples))
+        for first in range(0, n_resamples, resamples):
+            size = min(resamples, n_resamples - first)
+            counts = rng.multinomial(n, np.full(n, 1 / n), size=size)
+            replicates[:, first : first + size] = (chunk @ counts.T) / n
+        low[start : start + cells], high[start : start + cells] = np.quantile(
+            replicates, [alpha, 1 - alpha], axis=-1
+        )
+
+    return low.reshape(samples.shape[:-1]), high.reshape(samples.shape[:-1])
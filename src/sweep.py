@@ -0,0 +1,177 @@
+from typing import Dict, Optional, Sequence
+
+import numpy as np
+
+from .ball_rules import STATUS_CODES, pokemon_attributes
+from .catching import attempt_catch_batch, ball_modifiers_batch
+from .cube import ResultCube
+from .pokemon import PokemonFactory, StatusEffect, current_hp_for, max_hp_for
+from .trace import ThrowTracer
+
+# Upper bound of simulated throws held in memory at once
+_MAX_BATCH = 1 << 22
+
+_METRICS = ("success_rate", "capture_rate")
+
+
+def sweep_axes(
+    pokemon: Sequence[str],
+    statuses: Sequence[str],
+    hp_percentages: Sequence[float],
+    levels: Sequence[int],
+    pokeballs: Sequence[str],
+) -> Dict[str, list]:
+    """Axes of a sweep in the order the analyses loop over them"""
+    return {
+        "pokemon": list(pokemon),
+        "status": list(statuses),
+        "hp_perc": list(hp_percentages),
+        "level": list(levels),
+        "pokeball": list(pokeballs),
+    }
+
+
+def check_labels(axes: Dict[str, list], **labels):
+    """Raises ValueError when a label, e.g. a fixed value of a config, is not on its axis"""
+    for dim, label in labels.items():
+        if label not in axes[dim]:
+            raise ValueError(f"{dim} {label!r} is not one of the configured values {axes[dim]}")
+
+
+def run_sweep(
+    axes: Dict[str, list],
+    num_experiments: int,
+    noise: float = 0.0,
+    metric: str = "success_rate",
+    out: Optional[ResultCube] = None,
+    rng: Optional[np.random.Generator] = None,
+    factory: Optional[PokemonFactory] = None,
+    tracer: Optional[ThrowTracer] = None,
+    dedupe: bool = True,
+    dtype=np.float64,
+) -> ResultCube:
+    """Simulates every (pokemon, status, hp, level, pokeball) cell of a grid
+
+    Each pokemon is simulated as one batch of throws and written to its slab
+    of the result cube, so the cube can be a memory map larger than RAM.
+    Cells of a pokemon whose formula inputs resolve to the same values share
+    one simulation, so equal cells also get equal results.
+
+    Parameters
+    ----------
+    axes::[dict[str, list]]
+        Grid to simulate, see sweep_axes
+    num_experiments::int
+        Throws simulated for every cell
+    noise::float
+        Standard deviation of the multiplicative noise
+    metric::str
+        "success_rate" for the fraction of successful throws or
+        "capture_rate" for the mean capture rate
+    out::[ResultCube]
+        Cube to write into, e.g. a shared memory map opened with "r+". Its
+        axes must match `axes` except for pokemon, which may be a subset so
+        several workers can fill one file. Each slab is marked written once
+        simulated, see ResultCube.mark_written. Defaults to a new in-memory
+        cube of type `dtype`
+    rng::[np.random.Generator]
+        Random generator, defaults to a fresh one
+    factory::[PokemonFactory]
+        Factory used to look up the pokemon, defaults to "pokemon.json"
+    tracer::[ThrowTracer]
+        Records every throw, tagged with the flat index of its cell in `out`
+        (the first cell with the same inputs when deduplicating)
+    dedupe::bool
+        Simulate cells with equal formula inputs once, see above
+    dtype::[np.dtype]
+        Floating point type of the draws, the formula and the accumulated
+        capture rates, see attempt_catch_batch. Successes are counted as
+        integers in any precision
+
+    Returns
+    -------
+    cube::ResultCube
+        The cube holding the results
+    """
+    if metric not in _METRICS:
+        raise ValueError(f"metric has to be one of {_METRICS}")
+    rng = rng or np.random.default_rng()
+    factory = factory or PokemonFactory("pokemon.json")
+
+    if out is None:
+        out = ResultCube(axes, np.zeros(tuple(len(v) for v in axes.values()), dtype))
+    for dim, labels in axes.items():
+        if dim != "pokemon" and out.axes[dim] != labels:
+            raise ValueError(f"{dim} axis of the output cube doesn't match the sweep")
+
+    statuses = [StatusEffect[s] for s in axes["status"]]
+
+    # Broadcast shape of one pokemon: (status, hp, level, pokeball)
+    status = np.array([s.value[1] for s in statuses])[:, None, None, None]
+    status_code = np.array([STATUS_CODES[s] for s in statuses])[:, None, None, None]
+    hp_perc = np.asarray(axes["hp_perc"])[None, :, None, None]
+    levels = np.asarray(axes["level"])[None, None, :, None]
+    cell_shape = (len(statuses), hp_perc.size, levels.size, len(axes["pokeball"]))
+    n_cells = int(np.prod(cell_shape))
+
+    for pkmn_name in axes["pokemon"]:
+        base = factory.create(pkmn_name, int(levels.flat[0]), StatusEffect.NONE, 1.0)
+
+        # Balls may depend on level and status, evaluate them over both axes
+        attributes = pokemon_attributes(base, level=levels, status=status_code)
+        modifiers = [ball_modifiers_batch(attributes, ball) for ball in axes["pokeball"]]
+        ball_shape = (len(statuses), 1, levels.size, 1)
+        catch_rate, ball_rate = (
+            np.concatenate([np.broadcast_to(m[i], ball_shape) for m in modifiers], axis=3)
+            for i in range(2)
+        )
+
+        max_hp = max_hp_for(base.stats.hp, levels)
+        curr_hp = current_hp_for(max_hp, hp_perc)
+
+        # One row of formula inputs per cell, cells with equal rows are the same
+        # experiment: e.g. a fastball on a slow pokemon or statuses sharing a
+        # multiplier. Each distinct row is simulated once and fanned out
+        inputs = np.stack(
+            [
+                np.broadcast_to(x, cell_shape).ravel()
+                for x in (max_hp, curr_hp, catch_rate, ball_rate, status)
+            ],
+            axis=1,
+        )
+        if dedupe:
+            inputs, first, inverse = np.unique(
+                inputs, axis=0, return_index=True, return_inverse=True
+            )
+        else:
+            first = inverse = np.arange(n_cells)
+
+        slab = out.position("pokemon", pkmn_name)
+        tags = (first + slab * n_cells).astype(np.uint64)[:, None]
+        columns = [column[:, None].astype(dtype) for column in inputs.T]
+        batch = max(1, min(num_experiments, _MAX_BATCH // max(len(inputs), 1)))
+
+        # Exact success counts, float32 sums stop counting past 2^24 throws
+        total = np.zeros(len(inputs), np.int64 if metric == "success_rate" else dtype)
+        done = 0
+        while done < num_experiments:
+            trials = min(batch, num_experiments - done)
+            # Broadcasting one input over the trials axis sets the batch shape
+            success, rate = attempt_catch_batch(
+                np.broadcast_to(columns[0], (len(inputs), trials)),
+                *columns[1:],
+                noise,
+                rng,
+                tracer,
+                tags,
+                dtype,
+            )
+            values = success if metric == "success_rate" else rate
+            total += values.sum(axis=-1, dtype=total.dtype)
+            done += trials
+
+        out.values[slab] = (total / num_experiments)[inverse].reshape(cell_shape)
+        out.mark_written(pkmn_name)
+
+    out.flush()
+    return out
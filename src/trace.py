@@ -0,0 +1,439 @@
+import collections
+import gzip
+import json
+import struct
+import threading
+from typing import Iterator, NamedTuple, Optional, Sequence, Tuple
+
+import numpy as np
+
+from .catching import capture_rate, throw_draws
+
+_INPUTS = ("max_hp", "curr_hp", "catch_rate", "ball_rate", "status")
+
+# One fixed-width record per cell of a batch, the inputs its throws share
+CELL_DTYPE = np.dtype(
+    [
+        ("tag", "<u8"),  # Caller defined id, e.g. the sweep cell or the species
+        *((name, "<f8") for name in _INPUTS),
+        ("successes", "<u8"),  # Throws of the cell that caught the pokemon
+    ]
+)
+
+# One record per throw, as rebuilt by the reader
+TRACE_DTYPE = np.dtype(
+    [
+        ("tag", "<u8"),
+        *((name, "<f8") for name in _INPUTS),
+        ("noise_multiplier", "<f8"),
+        ("uniform", "<f8"),  # Draw compared against the capture rate
+        ("capture_rate", "<f8"),
+        ("success", "?"),
+    ]
+)
+
+_MAGIC = b"PKMNTRC2"
+# Functions drawing the inputs of batches recorded with record_source
+_SOURCES = ("population",)
+_LENGTH = struct.Struct("<I")
+
+
+class TraceBatch(NamedTuple):
+    cells: np.ndarray  # CELL_DTYPE records of the batch
+    cell_shape: Tuple[int, ...]  # Shape of the cells, broadcast over the batch
+    shape: Tuple[int, ...]  # Shape of the batch of throws
+    state: dict  # Bit generator state the draws of the batch start from
+    noise: float
+    precision: np.dtype  # Floating point type of the draws and the formula
+    # Successes of each tag for batches drawn again from their source, whose
+    # cells only hold the inputs. None when the cells hold their successes
+    tag_successes: Optional[np.ndarray] = None
+
+
+def _cell_shape(arrays: Sequence[np.ndarray], shape: Tuple[int, ...]) -> Tuple[int, ...]:
+    """The batch shape without the axes every array is broadcast along"""
+    views = [np.broadcast_to(x, shape) for x in arrays]
+    return tuple(
+        n if any(v.strides[i] != 0 for v in views) else 1 for i, n in enumerate(shape)
+    )
+
+
+def _reduced_axes(cell_shape, shape) -> Tuple[int, ...]:
+    return tuple(i for i, (c, n) in enumerate(zip(cell_shape, shape)) if c != n)
+
+
+def _generator(state: dict) -> np.random.Generator:
+    """Generator restored to a recorded bit_generator.state"""
+    bit_generator = getattr(np.random, state["bit_generator"])()
+    bit_generator.state = state
+    return np.random.Generator(bit_generator)
+
+
+def _write_block(f, header: dict):
+    data = json.dumps(header, default=lambda o: o.tolist()).encode()
+    f.write(_LENGTH.pack(len(data)) + data)
+
+
+def _read_block(f) -> Optional[dict]:
+    length = f.read(_LENGTH.size)
+    if not length:
+        return None
+    (length,) = _LENGTH.unpack(length)
+    return json.loads(f.read(length))
+
+
+class ThrowTracer:
+    """Opt-in recorder of every throw of a run, for audits and replays
+
+    Throws are not written one by one. Every batch stores one fixed-width
+    record (CELL_DTYPE) per cell, i.e. per distinct set of formula inputs,
+    holding the inputs and the successes of the cell, plus the generator
+    state its draws start from. The reader draws the same noise multipliers
+    and uniforms again and rebuilds each throw exactly, see iter_trace.
+    Batches whose inputs are themselves drawn, like population chunks, only
+    store the parameters of their source, see record_source.
+
+    A writer thread counts the successes, packs the cells into a
+    preallocated ring buffer and writes it to a gzip file in bulk. Recorded
+    batches wait for it up to `max_pending_bytes`, after which `record`
+    blocks. Recorded arrays must not be modified afterwards. Use as a
+    context manager or call close().
+
+    Parameters
+    ----------
+    path::str
+        File to write the trace to
+    capacity::int
+        Cell records held by the ring buffer before a bulk write
+    compresslevel::int
+        gzip compression level, 1 favours speed
+    meta::[dict]
+        JSON serializable description of the run, e.g. the config
+    max_pending_bytes::int
+        Memory of recorded batches the writer may fall behind by
+    """
+
+    def __init__(
+        self,
+        path: str,
+        capacity: int = 1 << 16,
+        compresslevel: int = 1,
+        meta: Optional[dict] = None,
+        max_pending_bytes: int = 1 << 26,
+    ):
+        self._file = gzip.open(path, "wb", compresslevel=compresslevel)
+        self._file.write(_MAGIC)
+        _write_block(
+            self._file,
+            {"dtype": CELL_DTYPE.descr, "numpy": np.__version__, "meta": meta or {}},
+        )
+
+        self._ring = np.zeros(capacity, CELL_DTYPE)
+        self._size = 0
+        self._records = 0
+        self._error: Optional[BaseException] = None
+
+        self._max_pending_bytes = max_pending_bytes
+        self._pending = collections.deque()
+        self._pending_bytes = 0
+        self._closing = False
+        self._condition = threading.Condition()
+        self._writer = threading.Thread(target=self._write_loop, daemon=True)
+        self._writer.start()
+
+    @property
+    def records(self) -> int:
+        """Throws recorded so far"""
+        return self._records
+
+    def record(self, inputs, success, state: dict, noise: float, tag=0):
+        """Records a batch of throws
+
+        Parameters
+        ----------
+        inputs::[tuple[np.ndarray]]
+            (max_hp, curr_hp, catch_rate, ball_rate, status), broadcastable
+            to the batch and all of the same floating point type
+        success::np.ndarray[bool]
+            Outcome of every throw, its shape is the batch shape
+        state::dict
+            bit_generator.state before the draws of the batch
+        noise::float
+            Standard deviation of the multiplicative noise
+        tag::[int | np.ndarray]
+            Id of the throws, broadcastable to the batch
+        """
+        self._raise_error()
+        shape = success.shape
+        arrays = [*inputs, np.asarray(tag)]
+        cell_shape = _cell_shape(arrays, shape)
+        index = tuple(slice(None) if c == n else slice(0, 1) for c, n in zip(cell_shape, shape))
+        cells = [np.broadcast_to(x, shape)[index].ravel() for x in arrays]
+
+        item = (cells, cell_shape, success, state, noise, np.result_type(inputs[0]).name)
+        self._enqueue(self._write_batch, item, sum(c.nbytes for c in cells) + success.nbytes)
+        self._records += success.size
+
+    def record_source(
+        self, source: str, params: dict, state: dict, size: int, noise: float, dtype, tag_successes
+    ):
+        """Records a batch of throws whose inputs are drawn from the generator too
+
+        Nothing per throw is stored: the reader restores `state`, draws the
+        inputs again with the `source` function and then the throws.
+
+        Parameters
+        ----------
+        source::str
+            "population", drawn by population.redraw_encounters
+        params::dict
+            JSON serializable arguments of the source
+        state::dict
+            bit_generator.state before the inputs of the batch were drawn
+        size::int
+            Throws of the batch
+        noise::float
+            Standard deviation of the multiplicative noise
+        dtype::np.dtype
+            Floating point type of the throws
+        tag_successes::np.ndarray[int]
+            Successes of each tag, checked by verify_trace
+        """
+        self._raise_error()
+        if source not in _SOURCES:
+            raise ValueError(f"source has to be one of {_SOURCES}")
+        block = {
+            "source": source,
+            "params": params,
+            "state": state,
+            "noise": noise,
+            "precision": np.dtype(dtype).name,
+            "shape": (size,),
+            "cell_shape": (size,),
+            "tag_successes": np.asarray(tag_successes).tolist(),
+            "cells": 0,
+        }
+        self._enqueue(_write_block, (self._file, block), np.asarray(tag_successes).nbytes)
+        self._records += size
+
+    def _enqueue(self, write, args, size: int):
+        with self._condition:
+            # An oversized batch is still accepted once the writer is idle
+            while self._pending and self._pending_bytes + size > self._max_pending_bytes:
+                self._condition.wait()
+            self._pending.append(((write, args), size))
+            self._pending_bytes += size
+            self._condition.notify_all()
+
+    def _write_loop(self):
+        while True:
+            with self._condition:
+                while not self._pending and not self._closing:
+                    self._condition.wait()
+                if not self._pending:
+                    break
+                (write, args), size = self._pending[0]
+
+            if self._error is None:
+                try:
+                    write(*args)
+                except BaseException as e:  # Surfaced by the next record or close
+                    self._error = e
+
+            with self._condition:
+                self._pending.popleft()
+                self._pending_bytes -= size
+                self._condition.notify_all()
+
+    def _write_batch(self, cells, cell_shape, success, state, noise, precision):
+        axes = _reduced_axes(cell_shape, success.shape)
+        successes = np.count_nonzero(success, axis=axes, keepdims=True).ravel()
+        _write_block(
+            self._file,
+            {
+                "state": state,
+                "noise": noise,
+                "precision": precision,
+                "shape": success.shape,
+                "cell_shape": cell_shape,
+                "cells": successes.size,
+            },
+        )
+
+        fields = dict(zip(_INPUTS + ("tag",), cells), successes=successes)
+        done = 0
+        while done < successes.size:
+            count = min(successes.size - done, self._ring.size - self._size)
+            chunk = self._ring[self._size : self._size + count]
+            for name, values in fields.items():
+                chunk[name] = values[done : done + count]
+            self._size += count
+            done += count
+            if self._size == self._ring.size:
+                self._flush()
+        # The next batch starts with its own header
+        self._flush()
+
+    def _flush(self):
+        self._file.write(memoryview(self._ring[: self._size]).cast("B"))
+        self._size = 0
+
+    def _raise_error(self):
+        if self._error is not None:
+            raise RuntimeError("Writing the throw trace failed") from self._error
+
+    def close(self):
+        """Writes the pending batches and closes the file"""
+        if self._writer.is_alive():
+            with self._condition:
+                self._closing = True
+                self._condition.notify_all()
+            self._writer.join()
+            self._file.close()
+        self._raise_error()
+
+    def __enter__(self) -> "ThrowTracer":
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def _open(path: str):
+    f = gzip.open(path, "rb")
+    if f.read(len(_MAGIC)) != _MAGIC:
+        f.close()
+        raise ValueError("Not a throw trace file")
+    header = _read_block(f)
+    # JSON turns the (name, format) pairs of the descr into lists
+    return f, np.dtype([tuple(field) for field in header["dtype"]]), header
+
+
+def trace_meta(path: str) -> dict:
+    """The `meta` dict a trace was written with"""
+    f, _, header = _open(path)
+    f.close()
+    return header["meta"]
+
+
+def _redraw(block: dict) -> TraceBatch:
+    """Batch of a record_source block, its cells drawn again from the source"""
+    # population imports this module for ThrowTracer
+    from .population import redraw_encounters
+
+    rng = _generator(block["state"])
+    (size,) = block["shape"]
+    tag, inputs = redraw_encounters(block["params"], size, rng)
+
+    precision = np.dtype(block["precision"])
+    cells = np.zeros(size, CELL_DTYPE)
+    cells["tag"] = tag
+    for name, values in zip(_INPUTS, inputs):
+        cells[name] = np.asarray(values, dtype=precision)
+    # The throws start where the draws of the inputs left the generator
+    return TraceBatch(
+        cells,
+        (size,),
+        (size,),
+        rng.bit_generator.state,
+        block["noise"],
+        precision,
+        np.asarray(block["tag_successes"], dtype=np.int64),
+    )
+
+
+def iter_batches(path: str) -> Iterator[TraceBatch]:
+    """Reads the recorded batches of a trace"""
+    f, dtype, _ = _open(path)
+    with f:
+        while True:
+            block = _read_block(f)
+            if block is None:
+                break
+            if "source" in block:
+                yield _redraw(block)
+                continue
+            data = f.read(block["cells"] * dtype.itemsize)
+            if len(data) != block["cells"] * dtype.itemsize:
+                raise ValueError("Truncated throw trace")
+            yield TraceBatch(
+                np.frombuffer(data, dtype=dtype),
+                tuple(block["cell_shape"]),
+                tuple(block["shape"]),
+                block["state"],
+                block["noise"],
+                np.dtype(block["precision"]),
+            )
+
+
+def replay_batch(batch: TraceBatch) -> np.ndarray:
+    """Rebuilds every throw of a batch as TRACE_DTYPE records
+
+    The recorded generator state gives back the same noise multipliers and
+    uniforms, so the rebuilt throws are the ones of the original run.
+    """
+    rng = _generator(batch.state)
+    noise_multiplier, uniform = throw_draws(rng, batch.shape, batch.noise, batch.precision)
+
+    inputs = [batch.cells[name].astype(batch.precision).reshape(batch.cell_shape) for name in _INPUTS]
+    rate = capture_rate(*inputs, noise_multiplier)
+
+    fields = dict(zip(_INPUTS, inputs))
+    fields.update(
+        tag=batch.cells["tag"].reshape(batch.cell_shape),
+        noise_multiplier=noise_multiplier,
+        uniform=uniform,
+        capture_rate=rate,
+        success=uniform < rate,
+    )
+    records = np.empty(int(np.prod(batch.shape)), TRACE_DTYPE)
+    for name, values in fields.items():
+        records[name] = np.broadcast_to(values, batch.shape).ravel()
+    return records
+
+
+def iter_trace(path: str) -> Iterator[np.ndarray]:
+    """Rebuilds the throws of a trace, one array of records per batch"""
+    for batch in iter_batches(path):
+        yield replay_batch(batch)
+
+
+def read_trace(path: str) -> np.ndarray:
+    """Rebuilds every throw of a trace into one structured array"""
+    chunks = list(iter_trace(path))
+    return np.concatenate(chunks) if chunks else np.zeros(0, TRACE_DTYPE)
+
+
+def replay(records: np.ndarray, precision=np.float64) -> Tuple[np.ndarray, np.ndarray]:
+    """Recomputes the (success, capture_rate) of throw records from their inputs
+
+    The noise multiplier and uniform draw of each record stand in for the
+    random generator, e.g. to evaluate the throws in another precision.
+    """
+    fields = _INPUTS + ("noise_multiplier",)
+    rate = capture_rate(*(records[name].astype(precision) for name in fields))
+    return records["uniform"].astype(precision) < rate, rate
+
+
+def verify_trace(path: str) -> int:
+    """Replays a trace, returning how many recorded cells it doesn't reproduce
+
+    A cell is reproduced when the rebuilt throws have its recorded successes.
+    Batches drawn again from their source count the tags instead.
+    """
+    mismatches = 0
+    for batch in iter_batches(path):
+        records = replay_batch(batch)
+        if batch.tag_successes is not None:
+            successes = np.bincount(
+                records["tag"].astype(np.int64),
+                weights=records["success"],
+                minlength=batch.tag_successes.size,
+            )
+            mismatches += int(np.count_nonzero(successes != batch.tag_successes))
+            continue
+        success = records["success"].reshape(batch.shape)
+        axes = _reduced_axes(batch.cell_shape, batch.shape)
+        successes = np.count_nonzero(success, axis=axes, keepdims=True).ravel()
+        mismatches += int(np.count_nonzero(successes != batch.cells["successes"]))
+    return mismatches